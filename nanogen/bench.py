@@ -0,0 +1,267 @@
+"""
+A reproducible benchmark of nanogen builds on synthetic blogs.
+"""
+import datetime
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from nanogen import models
+
+
+SIZES = {
+    'small': 100,
+    'medium': 10000,
+    'large': 100000,
+}
+
+STEPS = ('init', 'collect_posts', 'generate_posts', 'generate_index_page',
+         'generate_feeds', 'copy_static_files')
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+         'tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam '
+         'quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo').split()
+
+CODE_SAMPLES = {
+    'python': 'def greet(name):\n    """Say hello"""\n    return "Hello, {}!".format(name)\n',
+    'javascript': 'function greet(name) {\n  return `Hello, ${name}!`;\n}\n',
+    'bash': 'for name in alice bob; do\n  echo "Hello, $name!"\ndone\n',
+}
+
+CONFIG = """\
+[site]
+title = Benchmark blog
+author = Benchmark
+email = bench@example.com
+url = http://bench.example.com
+description = A synthetic blog for benchmarking nanogen.
+"""
+
+# Written into every blog ``generate_corpus`` creates. ``run`` deletes the
+# output and caches of the blog it benchmarks, so it refuses blogs without it
+MARKER_FILENAME = '.nanogen-bench'
+
+
+def is_corpus(directory):
+    """Whether ``directory`` holds a blog created by ``generate_corpus``."""
+    return os.path.isfile(os.path.join(directory, MARKER_FILENAME))
+
+
+def _sentence(rng, length):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _post_content(rng, number):
+    """Builds a post mixing prose, a list and fenced code blocks."""
+    blocks = ['# Benchmark post {}'.format(number), '']
+    for _ in range(rng.randint(2, 6)):
+        blocks.append(' '.join(_sentence(rng, rng.randint(6, 18)) for _ in range(4)))
+        blocks.append('')
+
+    blocks.extend('* {}'.format(_sentence(rng, 5)) for _ in range(rng.randint(2, 5)))
+    blocks.append('')
+
+    for _ in range(rng.randint(0, 2)):
+        lang = rng.choice(sorted(CODE_SAMPLES))
+        blocks.extend(['```{}'.format(lang), CODE_SAMPLES[lang], '```', ''])
+    return '\n'.join(blocks)
+
+
+def generate_corpus(directory, count, seed=0):
+    """
+    Creates a nanogen blog with ``count`` synthetic posts.
+
+    The same ``count`` and ``seed`` always produce the same posts.
+
+    :param directory: Where to create the blog
+    :type directory: str
+    :param count: How many posts to create
+    :type count: int
+    :param seed: The seed for the random content of the posts
+    :type seed: int
+    :return: None
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    models.Blog(directory).init()
+    with open(os.path.join(directory, 'blog.cfg'), 'w') as f:
+        f.write(CONFIG)
+    with open(os.path.join(directory, MARKER_FILENAME), 'w') as f:
+        f.write('{} {}\n'.format(count, seed))
+
+    rng = random.Random(seed)
+    start = datetime.date(2000, 1, 1)
+    posts_dir = os.path.join(directory, '_posts')
+    for number in range(count):
+        date = start + datetime.timedelta(days=number // 4)
+        filename = '{}-benchmark-post-{}.md'.format(date.isoformat(), number)
+        with open(os.path.join(posts_dir, filename), 'w') as f:
+            f.write(_post_content(rng, number))
+
+
+# Runs ``time_build`` and prints its timings as JSON on the last line
+CHILD_SCRIPT = """\
+import json, sys
+from nanogen import bench
+print(json.dumps(bench.time_build(sys.argv[1], int(sys.argv[2]))))
+"""
+
+
+def _peak_memory():
+    """
+    The peak resident set size of this process, in bytes. It never goes
+    down, so it's only the peak of a build when the build runs in a process
+    of its own (see ``time_build_in_child``).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, everything else reports kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def time_build(directory, jobs=1):
+    """
+    Builds the blog in ``directory``, timing each step of the build.
+
+    :return: A dictionary of step names to seconds, plus the peak memory
+    :rtype: dict
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    blog = models.Blog(directory)
+    timings['init'] = time.perf_counter() - start
+
+    if not os.path.isdir(blog.output_dir):
+        os.makedirs(blog.output_dir)
+
+    steps = (
+        ('collect_posts', lambda: blog.posts),
+        ('generate_posts', lambda: blog.generate_posts(jobs=jobs)),
+        ('generate_index_page', blog.generate_index_page),
+        ('generate_feeds', blog.generate_feeds),
+        ('copy_static_files', blog.copy_static_files),
+    )
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+
+    timings['total'] = sum(timings[name] for name in STEPS)
+    timings['peak_memory'] = _peak_memory()
+    return timings
+
+
+def time_build_in_child(directory, jobs=1):
+    """
+    Runs ``time_build`` in a new interpreter, so that the peak memory it
+    reports belongs to that build alone, rather than to every build (and
+    the corpus generation) that ran in this process before it.
+
+    :return: A dictionary of step names to seconds, plus the peak memory
+    :rtype: dict
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(path for path in (root, env.get('PYTHONPATH')) if path)
+
+    output = subprocess.check_output([sys.executable, '-c', CHILD_SCRIPT, directory, str(jobs)],
+                                     env=env, universal_newlines=True)
+    return json.loads(output.splitlines()[-1])
+
+
+def run(directory, jobs=1):
+    """
+    Times a cold build (no output, no caches) followed by a warm build of
+    the blog in ``directory``, each in a process of its own.
+
+    The cold build starts by deleting the blog's output and caches, so only
+    blogs created by ``generate_corpus`` can be benchmarked.
+
+    :return: The timings of the cold and warm builds
+    :rtype: dict
+    :raises ValueError: If ``directory`` wasn't created by ``generate_corpus``
+    """
+    if not is_corpus(directory):
+        raise ValueError('{} is not a benchmark blog; nanogen bench only runs on '
+                         'blogs it generated itself'.format(directory))
+
+    blog = models.Blog(directory)
+    for path in (blog.output_dir, blog.PATHS['cache']):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+    return {
+        'cold': time_build_in_child(directory, jobs),
+        'warm': time_build_in_child(directory, jobs),
+    }
+
+
+def compare(results, baseline, threshold=0.1, min_delta=0.005):
+    """
+    Compares benchmark results against a baseline.
+
+    :param results: Results returned by ``run``
+    :type results: dict
+    :param baseline: Results of an earlier run
+    :type baseline: dict
+    :param threshold: How much slower (as a fraction) a step may get before
+                      it counts as a regression
+    :type threshold: float
+    :param min_delta: How many seconds slower a step must get to count as a
+                      regression, so that noise in very short steps is ignored
+    :type min_delta: float
+    :return: (run, step, baseline seconds, seconds) for every regression
+    :rtype: list
+    """
+    regressions = []
+    for run_name, timings in sorted(results.items()):
+        for step in STEPS + ('total',):
+            before = baseline.get(run_name, {}).get(step)
+            after = timings.get(step)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > min_delta:
+                regressions.append((run_name, step, before, after))
+    return regressions
+
+
+def report(results, posts):
+    """
+    Formats benchmark results as a human readable table.
+
+    :rtype: str
+    """
+    lines = ['Benchmark of {} posts'.format(posts), '',
+             '{:<22}{:>12}{:>12}'.format('Step', 'Cold (s)', 'Warm (s)')]
+    for step in STEPS + ('total',):
+        lines.append('{:<22}{:>12.3f}{:>12.3f}'.format(
+            step, results['cold'][step], results['warm'][step]))
+
+    if results['cold']['peak_memory'] is not None:
+        lines.append('{:<22}{:>12.1f}{:>12.1f}'.format(
+            'peak_memory (MB)',
+            results['cold']['peak_memory'] / (1024.0 * 1024.0),
+            results['warm']['peak_memory'] / (1024.0 * 1024.0)))
+    return '\n'.join(lines)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
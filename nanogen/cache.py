@@ -0,0 +1,225 @@
+"""
+Disk caches for rendered post HTML and compiled templates.
+"""
+import os
+import tempfile
+
+import jinja2
+
+from nanogen import logger
+from nanogen import renderer
+from nanogen import utils
+
+
+class RenderCache(object):
+    """
+    Maps a hash of a post's Markdown (plus the versions of everything that
+    turns Markdown into HTML) to the HTML it rendered to.
+
+    Entries live in files under ``directory``. A hit touches the entry's
+    mtime, and when the cache grows beyond ``max_size`` bytes the least
+    recently used entries are evicted.
+    """
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    SUFFIX = '.html'
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self._size = None
+
+    def __repr__(self):
+        return u'{}(directory={}, max_size={})'.format(
+            self.__class__.__name__,
+            self.directory,
+            self.max_size
+        )
+
+    def key(self, markdown):
+        """
+        Computes the cache key for the given Markdown.
+
+        :param markdown: The Markdown content being rendered
+        :type markdown: str
+        :rtype: str
+        """
+        data = u'{}\0{}'.format(renderer.version_string(), markdown)
+        return utils.hash_bytes(data.encode('utf-8'))
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.SUFFIX)
+
+    def entries(self):
+        """
+        Lists every entry in the cache.
+
+        :return: A list of (path, size, mtime) tuples
+        :rtype: list
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((path, stat.st_size, stat.st_mtime))
+        return found
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        return self._size
+
+    def get(self, key):
+        """
+        Looks up the HTML stored under the given key.
+
+        :param key: A key returned by ``key``
+        :type key: str
+        :return: The cached HTML, or None if it isn't cached
+        :rtype: str
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                html = f.read().decode('utf-8')
+        except (IOError, OSError):
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return html
+
+    def set(self, key, html):
+        """
+        Stores HTML under the given key, evicting old entries if needed.
+
+        :param key: A key returned by ``key``
+        :type key: str
+        :param html: The rendered HTML
+        :type html: str
+        :return: None
+        """
+        path = self.entry_path(key)
+        entry_dir = os.path.dirname(path)
+        if not os.path.isdir(entry_dir):
+            os.makedirs(entry_dir, exist_ok=True)
+
+        data = html.encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._size = self.size + len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def render(self, markdown):
+        """
+        Renders the given Markdown to HTML, using the cache when possible.
+
+        :param markdown: The Markdown to render
+        :type markdown: str
+        :rtype: str
+        """
+        key = self.key(markdown)
+        html = self.get(key)
+        if html is None:
+            html = renderer.markdown(markdown)
+            self.set(key, html)
+        return html
+
+    def evict(self, target=None):
+        """
+        Removes the least recently used entries until the cache is no bigger
+        than ``target`` bytes (by default, 90% of ``max_size``).
+
+        :return: The number of entries removed
+        :rtype: int
+        """
+        if target is None:
+            target = int(self.max_size * 0.9)
+
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        size = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, entry_size, _ in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+
+        logger.log.debug('Evicted %d entries from the render cache', removed)
+        self._size = size
+        return removed
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+
+        :return: The number of entries removed
+        :rtype: int
+        """
+        return self.evict(target=0)
+
+    def stats(self):
+        """
+        Summarizes the contents of the cache.
+
+        :return: A dictionary with the entry count and sizes of the cache
+        :rtype: dict
+        """
+        entries = self.entries()
+        self._size = sum(size for _, size, _ in entries)
+        return {
+            'path': self.directory,
+            'entries': len(entries),
+            'size': self._size,
+            'max_size': self.max_size,
+        }
+
+
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Stores compiled Jinja templates on disk so that each nanogen process
+    (including every worker of a parallel build) can skip compiling
+    templates that haven't changed.
+
+    Jinja checks a checksum of each template's source before using its
+    cached bytecode, so editing a layout file invalidates its entry. Entries
+    are written atomically, since several processes may share the cache.
+    """
+
+    def __init__(self, directory):
+        super(TemplateBytecodeCache, self).__init__(directory, '%s.jinja')
+
+    def __repr__(self):
+        return u'{}(directory={})'.format(self.__class__.__name__, self.directory)
+
+    def dump_bytecode(self, bucket):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            bucket.write_bytecode(f)
+        os.replace(tmp_path, self._get_cache_filename(bucket))
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            super(TemplateBytecodeCache, self).clear()
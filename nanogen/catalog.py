@@ -0,0 +1,223 @@
+"""
+A persistent SQLite catalog of a blog's posts, so builds of large blogs can
+start without reading every post file.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from nanogen import logger
+from nanogen import utils
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    title TEXT NOT NULL,
+    pub_date TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    permalink TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    header_lines INTEGER NOT NULL,
+    html BLOB,
+    html_version TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_by_date ON posts (directory, pub_date, filename);
+"""
+
+# The columns a PostMeta is built from, in order
+META_COLUMNS = ('path', 'filename', 'title', 'pub_date', 'slug', 'permalink',
+                'tags', 'categories', 'summary', 'header_lines')
+
+
+class Catalog(object):
+    """
+    One row per post file: its mtime, size and content hash, the metadata
+    read from its header, and the HTML its Markdown last rendered to.
+
+    ``refresh`` brings the catalog up to date with a scan that only calls
+    ``stat`` on post files; only new and changed files are read. The rows
+    can then be turned back into metadata (``meta_type``, normally
+    ``nanogen.models.PostMeta``) without touching the files.
+    """
+    FILENAME = 'catalog.sqlite'
+    # Bump this whenever SCHEMA or what goes into a row changes
+    VERSION = 1
+
+    def __init__(self, directory, meta_type):
+        self.directory = directory
+        self.meta_type = meta_type
+        self.path = os.path.join(directory, self.FILENAME)
+        self._local = threading.local()
+
+    def __repr__(self):
+        return u'{}(path={})'.format(self.__class__.__name__, self.path)
+
+    @property
+    def connection(self):
+        """
+        The connection of the current thread; SQLite connections can't be
+        shared between threads.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connect()
+        return connection
+
+    def connect(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        # Worker processes of a parallel build write rendered HTML at the
+        # same time, so wait for each other's locks rather than failing
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        if connection.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+            logger.log.debug('Creating post catalog at %s', self.path)
+            with connection:
+                connection.execute('DROP TABLE IF EXISTS posts')
+                connection.executescript(SCHEMA)
+                connection.execute('PRAGMA user_version = {:d}'.format(self.VERSION))
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def refresh(self, directories):
+        """
+        Updates the rows of the posts in the given directories. Files whose
+        mtime and size match their row are skipped without being opened; files
+        whose content hash matches only get their mtime and size updated.
+
+        :param directories: The directories whose posts should be catalogued
+        :type directories: iterable
+        :return: The number of posts read and removed
+        :rtype: tuple
+        """
+        read = removed = 0
+        connection = self.connection
+        with connection:
+            for directory in directories:
+                rows = dict((row[0], row[1:]) for row in connection.execute(
+                    'SELECT path, mtime, size, hash FROM posts WHERE directory = ?', (directory,)))
+
+                for path in utils.iter_post_files(directory):
+                    stat = os.stat(path)
+                    row = rows.pop(path, None)
+                    if row is not None and row[:2] == (stat.st_mtime_ns, stat.st_size):
+                        continue
+
+                    digest = utils.hash_file(path)
+                    if row is not None and row[2] == digest:
+                        connection.execute('UPDATE posts SET mtime = ?, size = ? WHERE path = ?',
+                                           (stat.st_mtime_ns, stat.st_size, path))
+                        continue
+
+                    self.store(directory, path, stat, digest)
+                    read += 1
+
+                for path in rows:
+                    logger.log.debug('Removing deleted post %s from the catalog', path)
+                    connection.execute('DELETE FROM posts WHERE path = ?', (path,))
+                    removed += 1
+
+        logger.log.debug('Catalog read %d posts and removed %d', read, removed)
+        return read, removed
+
+    def store(self, directory, path, stat, digest):
+        """Reads a post file's header into its row, forgetting its HTML."""
+        logger.log.debug('Cataloguing post %s', path)
+        meta = self.meta_type.from_file('', path)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO posts (path, directory, filename, mtime, size, hash, title, '
+            'pub_date, slug, permalink, tags, categories, summary, header_lines) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, directory, meta.filename, stat.st_mtime_ns, stat.st_size, digest, meta.title,
+             meta.pub_date.strftime('%Y-%m-%d'), meta.slug, meta.permalink,
+             json.dumps(meta.tags), json.dumps(meta.categories), meta.summary, meta.header_lines)
+        )
+
+    def metas(self, base_path, directories):
+        """
+        Builds the metadata of the catalogued posts in the given directories,
+        oldest first, without reading any post files.
+
+        :param base_path: The directory the posts will be written into
+        :type base_path: str
+        :param directories: The directories whose posts to include
+        :type directories: iterable
+        :return: A generator of PostMeta
+        :rtype: generator
+        """
+        directories = list(directories)
+        query = 'SELECT {} FROM posts WHERE directory IN ({}) ORDER BY pub_date, filename'.format(
+            ', '.join(META_COLUMNS), ', '.join('?' * len(directories)))
+
+        for (path, filename, title, pub_date, slug, permalink,
+             tags, categories, summary, header_lines) in self.connection.execute(query, directories):
+            yield self.meta_type(
+                base_path=base_path,
+                path=path,
+                filename=filename,
+                title=title,
+                pub_date=datetime.datetime(*map(int, pub_date.split('-'))),
+                slug=slug,
+                html_filename='{}.html'.format(slug),
+                permalink=permalink,
+                permapath=os.path.join(base_path, permalink),
+                tags=tuple(json.loads(tags)),
+                categories=tuple(json.loads(categories)),
+                summary=summary,
+                header_lines=header_lines
+            )
+
+    def get_html(self, path, version):
+        """
+        Looks up the HTML a post last rendered to.
+
+        :param path: The path of the post's file
+        :type path: str
+        :param version: The renderer version the HTML must have been
+                        rendered by (see ``nanogen.renderer.version_string``)
+        :type version: str
+        :return: The HTML, or None if it isn't stored
+        :rtype: str
+        """
+        row = self.connection.execute(
+            'SELECT html FROM posts WHERE path = ? AND html_version = ?', (path, version)).fetchone()
+        return row[0].decode('utf-8') if row and row[0] is not None else None
+
+    def set_html(self, path, version, html):
+        """
+        Stores the HTML a post rendered to.
+
+        :return: None
+        """
+        with self.connection:
+            self.connection.execute(
+                'UPDATE posts SET html = ?, html_version = ? WHERE path = ?',
+                (html.encode('utf-8'), version, path))
+
+    def clear(self):
+        """
+        Removes the catalog.
+
+        :return: None
+        """
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.isfile(self.path + suffix):
+                os.unlink(self.path + suffix)
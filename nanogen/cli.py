@@ -1,11 +1,19 @@
 import datetime
 import os
+import shutil
+import tempfile
+import threading
 
 import click
 
+from nanogen import bench as bench_module
+from nanogen import highlight
 from nanogen import logger
 from nanogen import version
 from nanogen import models
+from nanogen import profiler
+from nanogen import utils
+from nanogen import watcher
 
 
 @click.group()
@@ -30,10 +38,37 @@ def clean():
 
 
 @cli.command()
-def build():
+@click.option('-j', '--jobs', default=1, type=int,
+              help='The number of processes to render posts with (0 for one per CPU)')
+@click.option('--stream', is_flag=True,
+              help='Release each post from memory once written, keeping only metadata')
+@click.option('--compress', is_flag=True,
+              help='Write gzip and brotli compressed copies of the generated files')
+@click.option('--profile', is_flag=True, help='Report where the build spent its time')
+@click.option('--profile-top', default=10, type=int, help='The number of slowest posts to report')
+@click.option('--profile-json', type=click.Path(), help='Write the build timings to a JSON file')
+@click.option('--cprofile', type=click.Path(), help='Write cProfile statistics to a file')
+def build(jobs, stream, compress, profile, profile_top, profile_json, cprofile):
     """Start a build of the site."""
-    blog = models.Blog(os.getcwd())
-    blog.build()
+    build_profiler = profiler.Profiler(enabled=bool(profile or profile_json))
+    cprofiler = None
+    if cprofile:
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+
+    with build_profiler.phase('total'):
+        blog = models.Blog(os.getcwd(), build_profiler=build_profiler)
+        blog.build(jobs=jobs or utils.cpu_count(), stream=stream,
+                   compress_output=compress)
+
+    if cprofiler:
+        cprofiler.disable()
+        cprofiler.dump_stats(cprofile)
+    if profile:
+        click.secho(build_profiler.report(top=profile_top))
+    if profile_json:
+        build_profiler.dump_json(profile_json)
 
 
 @cli.command()
@@ -60,34 +95,128 @@ def draft(title):
 @cli.command()
 @click.option('-h', '--host', default='localhost', help='The hostname to serve on')
 @click.option('-p', '--port', default=8080, type=int, help='The port to serve on')
-def preview(host, port):
+@click.option('-w', '--watch', is_flag=True, help='Rebuild the site when source files change')
+def preview(host, port, watch):
     """Serve a preview of the site on HOST and PORT."""
     blog = models.Blog(os.getcwd(), is_preview=True)
     blog.clean()
     blog.build()
 
-    try:
-        import SimpleHTTPServer, BaseHTTPServer
-        handler = SimpleHTTPServer.SimpleHTTPRequestHandler
-        handler.protocol_version = 'HTTP/1.0'
-        httpd = BaseHTTPServer.HTTPServer((host, port), handler)
-    except ImportError:
-        import http.server
-        handler = http.server.SimpleHTTPRequestHandler
-        handler.protocol_version = 'HTTP/1.0'
-        httpd = http.server.HTTPServer((host, port), handler)
+    if watch:
+        def rebuild(changed_paths):
+            blog.rebuild(changed_paths)
+            click.secho('Rebuilt the site after {} file(s) changed.'.format(len(changed_paths)))
+
+        site_watcher = watcher.Watcher(blog.watched_paths())
+        watch_thread = threading.Thread(target=site_watcher.watch, args=(rebuild,))
+        watch_thread.daemon = True
+        watch_thread.start()
+
+    from nanogen import server
+    httpd = server.PreviewServer(blog.PATHS['preview'], host, port)
 
     try:
         click.secho('Serving your site on http://{host}:{port}/...'.format(host=host, port=port))
         click.secho('Press <Ctrl-C> to stop the server.\n')
 
-        os.chdir(blog.PATHS['preview'])
-
         httpd.serve_forever()
     except KeyboardInterrupt:
         httpd.server_close()
 
 
+def parse_size(ctx, param, value):
+    """Turns a benchmark size (a name from ``bench.SIZES`` or a number) into a number of posts."""
+    if value in bench_module.SIZES:
+        return bench_module.SIZES[value]
+    try:
+        posts = int(value)
+    except ValueError:
+        posts = 0
+    if posts < 1:
+        raise click.BadParameter('must be a number of posts or one of: {}'.format(
+            ', '.join(sorted(bench_module.SIZES, key=bench_module.SIZES.get))))
+    return posts
+
+
+@cli.command()
+@click.option('-s', '--size', 'posts', default='small', callback=parse_size,
+              help='The number of posts to benchmark with, or one of: small, medium, large')
+@click.option('-j', '--jobs', default=1, type=int, help='The number of processes to render posts with')
+@click.option('-d', '--directory', type=click.Path(), help='Where to create the benchmark blog')
+@click.option('--seed', default=0, type=int, help='The seed for the generated posts')
+@click.option('--baseline', type=click.Path(exists=True), help='Results to compare against')
+@click.option('--threshold', default=0.1, type=float,
+              help='How much slower a step may get before it counts as a regression')
+@click.option('--save', type=click.Path(), help='Save the results to a file')
+def bench(posts, jobs, directory, seed, baseline, threshold, save):
+    """Benchmark builds of a synthetic blog."""
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix='nanogen-bench-')
+
+    elif os.path.exists(directory) and os.listdir(directory) and not bench_module.is_corpus(directory):
+        raise click.BadParameter('{} is not empty and was not created by nanogen bench'.format(directory),
+                                 param_hint='--directory')
+
+    try:
+        if not bench_module.is_corpus(directory):
+            click.secho('Generating {} posts in {}...'.format(posts, directory))
+            bench_module.generate_corpus(directory, posts, seed=seed)
+        results = bench_module.run(directory, jobs=jobs)
+    finally:
+        if temporary:
+            shutil.rmtree(directory)
+
+    click.secho(bench_module.report(results, posts))
+    if save:
+        bench_module.save_results(save, results)
+
+    if baseline:
+        regressions = bench_module.compare(results, bench_module.load_results(baseline), threshold)
+        for run_name, step, before, after in regressions:
+            click.secho('{} {}: {:.3f}s -> {:.3f}s'.format(run_name, step, before, after), fg='red')
+        if regressions:
+            raise click.ClickException('{} step(s) got slower than the baseline'.format(len(regressions)))
+
+
+@cli.group()
+def cache():
+    """Inspect or clear the rendered HTML and template caches."""
+
+
+@cache.command()
+def stats():
+    """Show how much is stored in the cache."""
+    blog = models.Blog(os.getcwd())
+    if blog.render_cache is None:
+        click.secho('The render cache is disabled.')
+        return
+
+    info = blog.render_cache.stats()
+    click.secho('Cache directory: {path}'.format(**info))
+    click.secho('Entries: {entries}'.format(**info))
+    click.secho('Size: {:.1f} MB of {:.1f} MB'.format(
+        info['size'] / (1024.0 * 1024.0),
+        info['max_size'] / (1024.0 * 1024.0)
+    ))
+
+
+@cache.command()
+def clear():
+    """Remove everything from the cache."""
+    blog = models.Blog(os.getcwd())
+    removed = 0
+    if blog.render_cache is not None:
+        removed += blog.render_cache.clear()
+    if blog.jinja_env.bytecode_cache is not None:
+        blog.jinja_env.bytecode_cache.clear()
+    if highlight.highlighter.disk_cache is not None:
+        removed += highlight.highlighter.disk_cache.clear()
+    if blog.catalog is not None:
+        blog.catalog.clear()
+    click.secho('Removed {} cached entries.'.format(removed))
+
+
 @cli.command()
 @click.argument('filename')
 def publish(filename):
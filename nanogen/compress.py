@@ -0,0 +1,220 @@
+"""
+Writes pre-compressed siblings (``index.html.gz``, ``index.html.br``) of the
+generated files, so a static web server can serve them without compressing
+anything itself.
+"""
+import concurrent.futures
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from nanogen import logger
+from nanogen import utils
+
+
+# Extensions of the files worth compressing; images, fonts and archives are
+# compressed already.
+EXTENSIONS = ('.html', '.xml', '.json', '.css', '.js', '.svg', '.txt')
+
+# Files smaller than this gain less from compression than the extra request
+# headers cost.
+DEFAULT_MIN_SIZE = 1024
+
+
+def _brotli_bytes(data):
+    return brotli.compress(data, quality=11)
+
+
+# Compression format name -> (sibling suffix, compressor)
+FORMATS = {
+    'gzip': ('.gz', utils.gzip_bytes),
+    'brotli': ('.br', _brotli_bytes),
+}
+
+SUFFIXES = tuple(suffix for suffix, _ in FORMATS.values())
+
+# Lists the siblings ``compress_tree`` wrote, relative to the directory it
+# compressed, so that only those are ever removed; compressed files that are
+# part of the site (e.g. a ``.tar.gz`` download) are left alone.
+RECORD_FILENAME = '.nanogen-compressed.json'
+
+
+def available_formats(formats=('gzip', 'brotli')):
+    """
+    Filters the given format names down to the ones that can be used; brotli
+    needs the optional ``brotli`` module.
+
+    :param formats: The names of the wanted formats
+    :type formats: iterable
+    :rtype: tuple
+    """
+    available = []
+    for name in formats:
+        if name not in FORMATS:
+            raise ValueError('Unknown compression format: {}'.format(name))
+        if name == 'brotli' and brotli is None:
+            logger.log.debug('The brotli module is not installed, skipping .br files')
+            continue
+        available.append(name)
+    return tuple(available)
+
+
+def is_compressible(path, min_size=DEFAULT_MIN_SIZE):
+    """
+    Determines whether the given file should get compressed siblings.
+
+    :param path: The file to check
+    :type path: str
+    :param min_size: The size, in bytes, of the smallest file to compress
+    :type min_size: int
+    :rtype: bool
+    """
+    name = os.path.basename(path)
+    if name.startswith('.') or not name.endswith(EXTENSIONS):
+        return False
+    try:
+        return os.path.getsize(path) >= min_size
+    except OSError:
+        return False
+
+
+def compress_file(path, formats=('gzip',)):
+    """
+    Writes a compressed sibling of a file in each of the given formats.
+
+    Each sibling is given its source's mtime, so a sibling whose mtime
+    matches its source's is known to be up to date and is left alone. Since
+    the build only rewrites files whose content changed, unchanged output is
+    never compressed twice.
+
+    :param path: The file to compress
+    :type path: str
+    :param formats: The names of the formats to write, see ``FORMATS``
+    :type formats: iterable
+    :return: The number of siblings written
+    :rtype: int
+    """
+    stat = os.stat(path)
+    data = None
+    written = 0
+    for name in formats:
+        suffix, compressor = FORMATS[name]
+        sibling = path + suffix
+        try:
+            if os.stat(sibling).st_mtime_ns == stat.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        utils.write_file(sibling, compressor(data))
+        os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written += 1
+    return written
+
+
+def read_record(path):
+    """
+    Reads the siblings a previous ``compress_tree`` wrote.
+
+    :param path: The record file
+    :type path: str
+    :rtype: set
+    """
+    try:
+        with open(path, 'r') as f:
+            return set(json.load(f))
+    except (IOError, OSError, ValueError):
+        return set()
+
+
+def _remove_siblings(directory, siblings, exclude):
+    removed = 0
+    for sibling in siblings:
+        path = os.path.join(directory, sibling)
+        if any(path.startswith(excluded + os.sep) for excluded in exclude):
+            # Whatever is there now belongs to someone else
+            continue
+        if os.path.isfile(path):
+            os.unlink(path)
+            removed += 1
+    return removed
+
+
+def remove_compressed(directory, exclude=()):
+    """
+    Removes every sibling written by an earlier ``compress_tree``, so that
+    a web server doesn't serve stale compressed copies once compression is
+    turned off.
+
+    :param directory: The directory that was compressed
+    :type directory: str
+    :param exclude: Directories to leave alone, see ``compress_tree``
+    :type exclude: iterable
+    :return: The number of siblings removed
+    :rtype: int
+    """
+    record_path = os.path.join(directory, RECORD_FILENAME)
+    if not os.path.isfile(record_path):
+        return 0
+
+    exclude = set(os.path.normpath(path) for path in exclude)
+    removed = _remove_siblings(directory, read_record(record_path), exclude)
+    os.unlink(record_path)
+    logger.log.debug('Removed %d compressed files', removed)
+    return removed
+
+
+def compress_tree(directory, formats=('gzip',), min_size=DEFAULT_MIN_SIZE, jobs=None, exclude=()):
+    """
+    Writes compressed siblings of every compressible file in a directory,
+    using a pool of threads (zlib and brotli release the GIL while they
+    work). Siblings written by an earlier call whose source file was removed
+    or is now too small to compress are removed; other compressed files in
+    the directory are never touched.
+
+    :param directory: The directory to compress the files of
+    :type directory: str
+    :param formats: The names of the formats to write, see ``FORMATS``
+    :type formats: iterable
+    :param min_size: The size, in bytes, of the smallest file to compress
+    :type min_size: int
+    :param jobs: How many threads to compress with (default: one per CPU)
+    :type jobs: int
+    :param exclude: Directories to leave alone, e.g. ones that hold files
+                    that are compressed already
+    :type exclude: iterable
+    :return: The number of siblings written and removed
+    :rtype: tuple
+    """
+    record_path = os.path.join(directory, RECORD_FILENAME)
+    exclude = set(os.path.normpath(path) for path in exclude)
+    suffixes = [FORMATS[name][0] for name in formats]
+
+    sources = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) not in exclude]
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(SUFFIXES) and is_compressible(path, min_size):
+                sources.append(path)
+
+    siblings = set(os.path.relpath(path + suffix, directory)
+                   for path in sources for suffix in suffixes)
+
+    removed = _remove_siblings(directory, read_record(record_path) - siblings, exclude)
+
+    written = 0
+    if sources:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or utils.cpu_count()) as pool:
+            written = sum(pool.map(lambda path: compress_file(path, formats), sources))
+
+    utils.write_file(record_path, json.dumps(sorted(siblings), indent=1))
+    logger.log.debug('Wrote %d compressed files and removed %d', written, removed)
+    return written, removed
@@ -0,0 +1,309 @@
+"""
+Built-in RSS 2.0, Atom and JSON Feed writers, which stream a feed's items
+straight into its file instead of rendering the whole feed with a template.
+"""
+import abc
+import datetime
+import email.utils
+import itertools
+import json
+
+from xml.sax import saxutils
+
+from nanogen import utils
+
+
+CONTENT_MODES = ('full', 'summary')
+
+DEFAULT_LIMIT = 10
+
+# The date of an Atom feed without any posts, which still needs an <updated>
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def summary_html(post):
+    """
+    The summary of a post as HTML: its ``summary`` metadata if it has any,
+    otherwise the first paragraph of its content.
+
+    :param post: The post to summarize
+    :type post: nanogen.models.Post
+    :rtype: str
+    """
+    if post.summary:
+        return u'<p>{}</p>'.format(saxutils.escape(post.summary))
+    html = post.html_content
+    end = html.find('</p>')
+    return html[:end + len('</p>')] if end != -1 else html
+
+
+class FeedWriter(object, metaclass=abc.ABCMeta):
+    """
+    Writes one format of feed. Subclasses turn the feed's header, each of its
+    items and its footer into text.
+
+    Items are written one at a time. Unless ``write`` is told not to, each
+    post's encoded item is also kept until ``clear_items`` is called, so a
+    post that appears in several feeds (the main feed and those of its tags
+    and categories) is only escaped and encoded once per build.
+    """
+    FILENAME = None
+    SEPARATOR = u'\n'
+
+    def __init__(self, site, limit=DEFAULT_LIMIT, content='full'):
+        if content not in CONTENT_MODES:
+            raise ValueError('Unknown feed content: {}'.format(content))
+        self.site = site
+        self.limit = limit
+        self.content = content
+        self.items = {}
+
+    def __repr__(self):
+        return u'{}(limit={}, content={})'.format(
+            self.__class__.__name__,
+            self.limit,
+            self.content
+        )
+
+    def url(self, path):
+        return u'{}/{}'.format(self.site['url'], path)
+
+    def content_html(self, post):
+        return post.html_content if self.content == 'full' else summary_html(post)
+
+    @abc.abstractmethod
+    def header(self, title, feed_url, posts):
+        """
+        :param title: The title of the feed
+        :type title: str
+        :param feed_url: The absolute URL of the feed
+        :type feed_url: str
+        :param posts: The posts the feed lists, newest first
+        :type posts: list
+        :return: Everything that comes before the feed's first item
+        :rtype: str
+        """
+
+    @abc.abstractmethod
+    def item(self, post):
+        """
+        :param post: The post to list
+        :type post: nanogen.models.Post
+        :return: The feed's entry for the post
+        :rtype: str
+        """
+
+    @abc.abstractmethod
+    def footer(self):
+        """
+        :return: Everything that comes after the feed's last item
+        :rtype: str
+        """
+
+    def encoded_item(self, post, cache=True):
+        encoded = self.items.get(post)
+        if encoded is None:
+            encoded = self.item(post).encode('utf-8')
+            if cache:
+                self.items[post] = encoded
+        return encoded
+
+    def clear_items(self):
+        """
+        Forgets the encoded items kept by ``write``.
+
+        :return: None
+        """
+        self.items.clear()
+
+    def write(self, path, posts, feed_path, title=None, cache=True):
+        """
+        Writes a feed of the newest of the given posts.
+
+        :param path: The file to write the feed to
+        :type path: str
+        :param posts: The posts to list, newest first
+        :type posts: iterable
+        :param feed_path: The path of the feed within the site
+        :type feed_path: str
+        :param title: What the feed is about, if it isn't the whole site
+                      (e.g. a tag)
+        :type title: str
+        :param cache: Keep the encoded items for later feeds
+        :type cache: bool
+        :return: None
+        """
+        posts = list(itertools.islice(posts, self.limit or None))
+        feed_title = self.site['title'] if title is None else u'{}: {}'.format(self.site['title'], title)
+        separator = self.SEPARATOR.encode('utf-8')
+
+        with utils.open_atomic(path) as f:
+            f.write(self.header(feed_title, self.url(feed_path), posts).encode('utf-8'))
+            for number, post in enumerate(posts):
+                if number:
+                    f.write(separator)
+                f.write(self.encoded_item(post, cache))
+            f.write(self.footer().encode('utf-8'))
+
+
+class RSSWriter(FeedWriter):
+    FILENAME = 'rss.xml'
+
+    def header(self, title, feed_url, posts):
+        return (
+            u'<?xml version="1.0" encoding="utf-8"?>\n'
+            u'<rss version="2.0">\n'
+            u'<channel>\n'
+            u'<title>{}</title>\n'
+            u'<link>{}</link>\n'
+            u'<description>{}</description>\n'
+            u'<managingEditor>{}</managingEditor>\n'
+        ).format(
+            saxutils.escape(title),
+            saxutils.escape(self.site['url']),
+            saxutils.escape(self.site['description']),
+            saxutils.escape(u'{} ({})'.format(self.site['email'], self.site['author']))
+        )
+
+    def item(self, post):
+        url = saxutils.escape(self.url(post.permalink))
+        return (
+            u'<item>\n'
+            u'<guid>{}</guid>\n'
+            u'<link>{}</link>\n'
+            u'<title>{}</title>\n'
+            u'<pubDate>{}</pubDate>\n'
+            u'<description>{}</description>\n'
+            u'</item>'
+        ).format(
+            url,
+            url,
+            saxutils.escape(post.title),
+            email.utils.format_datetime(post.pub_date),
+            saxutils.escape(self.content_html(post))
+        )
+
+    def footer(self):
+        return u'\n</channel>\n</rss>\n'
+
+
+class AtomWriter(FeedWriter):
+    FILENAME = 'atom.xml'
+
+    @staticmethod
+    def date(value):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def header(self, title, feed_url, posts):
+        updated = posts[0].pub_date if posts else EPOCH
+        return (
+            u'<?xml version="1.0" encoding="utf-8"?>\n'
+            u'<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            u'<id>{feed_url}</id>\n'
+            u'<title>{title}</title>\n'
+            u'<subtitle>{description}</subtitle>\n'
+            u'<link href={feed_url_attr} rel="self"/>\n'
+            u'<link href={site_url_attr}/>\n'
+            u'<updated>{updated}</updated>\n'
+            u'<author><name>{author}</name><email>{email}</email></author>\n'
+        ).format(
+            feed_url=saxutils.escape(feed_url),
+            title=saxutils.escape(title),
+            description=saxutils.escape(self.site['description']),
+            feed_url_attr=saxutils.quoteattr(feed_url),
+            site_url_attr=saxutils.quoteattr(self.site['url']),
+            updated=self.date(updated),
+            author=saxutils.escape(self.site['author']),
+            email=saxutils.escape(self.site['email'])
+        )
+
+    def item(self, post):
+        url = self.url(post.permalink)
+        content_tag = 'content' if self.content == 'full' else 'summary'
+        return (
+            u'<entry>\n'
+            u'<id>{url}</id>\n'
+            u'<title>{title}</title>\n'
+            u'<link href={url_attr}/>\n'
+            u'<published>{date}</published>\n'
+            u'<updated>{date}</updated>\n'
+            u'<{tag} type="html">{content}</{tag}>\n'
+            u'</entry>'
+        ).format(
+            url=saxutils.escape(url),
+            title=saxutils.escape(post.title),
+            url_attr=saxutils.quoteattr(url),
+            date=self.date(post.pub_date),
+            tag=content_tag,
+            content=saxutils.escape(self.content_html(post))
+        )
+
+    def footer(self):
+        return u'\n</feed>\n'
+
+
+class JSONFeedWriter(FeedWriter):
+    FILENAME = 'feed.json'
+    SEPARATOR = u',\n'
+
+    def header(self, title, feed_url, posts):
+        # Everything but the items, with the items' list left open
+        feed = json.dumps({
+            'version': 'https://jsonfeed.org/version/1',
+            'title': title,
+            'home_page_url': self.site['url'],
+            'feed_url': feed_url,
+            'description': self.site['description'],
+            'author': {'name': self.site['author']},
+        }, sort_keys=True)
+        return feed[:-1] + u', "items": [\n'
+
+    def item(self, post):
+        url = self.url(post.permalink)
+        item = {
+            'id': url,
+            'url': url,
+            'title': post.title,
+            'date_published': post.pub_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        }
+        if self.content == 'full':
+            item['content_html'] = post.html_content
+        else:
+            item['content_html'] = summary_html(post)
+            if post.summary:
+                item['summary'] = post.summary
+        return json.dumps(item, sort_keys=True)
+
+    def footer(self):
+        return u'\n]}\n'
+
+
+# Format names, as used in the ``[feeds]`` section of the config
+WRITERS = {
+    'rss': RSSWriter,
+    'atom': AtomWriter,
+    'json': JSONFeedWriter,
+}
+
+
+def create_writers(site, formats=('rss', 'json'), limit=DEFAULT_LIMIT, content='full'):
+    """
+    Creates a writer for each of the given feed formats.
+
+    :param site: The ``[site]`` section of the config
+    :type site: configparser.SectionProxy
+    :param formats: Names of formats, see ``WRITERS``
+    :type formats: iterable
+    :param limit: The most posts a feed lists (0 for every post)
+    :type limit: int
+    :param content: ``full`` to include each post's content, ``summary``
+                    to include only its summary
+    :type content: str
+    :rtype: list
+    """
+    writers = []
+    for name in formats:
+        if name not in WRITERS:
+            raise ValueError('Unknown feed format: {}'.format(name))
+        writers.append(WRITERS[name](site, limit=limit, content=content))
+    return writers
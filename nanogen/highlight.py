@@ -0,0 +1,169 @@
+"""
+Syntax highlighting of fenced code blocks, with the Pygments lexers and
+formatters reused between blocks and the highlighted HTML memoized.
+
+Pygments is only imported the first time a block is highlighted.
+"""
+import collections
+
+from nanogen import logger
+from nanogen import utils
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_DISK_MAX_SIZE = 64 * 1024 * 1024
+
+# The class of the <div> Pygments wraps highlighted code in, which the
+# style sheet from ``css`` applies to
+CSS_CLASS = 'highlight'
+
+
+def css(style='default'):
+    """
+    The style sheet for highlighted code, to be written once per site.
+
+    :param style: The name of a Pygments style
+    :type style: str
+    :rtype: str
+    """
+    from pygments.formatters import HtmlFormatter
+
+    return HtmlFormatter(style=style).get_style_defs('.' + CSS_CLASS) + '\n'
+
+
+class Highlighter(object):
+    """
+    Turns code blocks into highlighted HTML.
+
+    One lexer is created per language and one formatter per set of options.
+    The HTML of the ``max_entries`` most recently highlighted blocks is kept
+    in memory, keyed by a hash of the language, code and options. With a
+    ``cache_dir``, highlighted blocks are also stored on disk (in a
+    ``nanogen.cache.RenderCache``), so an edited post only highlights the
+    blocks that changed, even in a new process.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=None,
+                 disk_max_size=DEFAULT_DISK_MAX_SIZE, linenos=False):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.disk_max_size = disk_max_size
+        self.linenos = linenos
+        self.entries = collections.OrderedDict()
+        self._lexers = {}
+        self._formatters = {}
+        self._disk_cache = None
+
+    def __repr__(self):
+        return u'{}(max_entries={}, cache_dir={}, linenos={})'.format(
+            self.__class__.__name__,
+            self.max_entries,
+            self.cache_dir,
+            self.linenos
+        )
+
+    @property
+    def disk_cache(self):
+        if self._disk_cache is None and self.cache_dir is not None:
+            from nanogen import cache
+            self._disk_cache = cache.RenderCache(self.cache_dir, max_size=self.disk_max_size)
+        return self._disk_cache
+
+    def lexer(self, lang):
+        """
+        :return: The lexer for the given language, or None if Pygments
+                 doesn't know the language
+        :rtype: pygments.lexer.Lexer
+        """
+        if lang not in self._lexers:
+            from pygments.lexers import get_lexer_by_name
+            from pygments.util import ClassNotFound
+
+            try:
+                self._lexers[lang] = get_lexer_by_name(lang, stripall=True)
+            except ClassNotFound:
+                logger.log.debug('No lexer for code blocks in %s', lang)
+                self._lexers[lang] = None
+        return self._lexers[lang]
+
+    def formatter(self):
+        """
+        :return: The HTML formatter for the current options
+        :rtype: pygments.formatters.HtmlFormatter
+        """
+        options = (self.linenos,)
+        if options not in self._formatters:
+            from pygments.formatters import HtmlFormatter
+            self._formatters[options] = HtmlFormatter(cssclass=CSS_CLASS, linenos=self.linenos)
+        return self._formatters[options]
+
+    def key(self, code, lang):
+        import pygments
+
+        data = u'{}\0{}\0{}\0{}'.format(pygments.__version__, lang, self.linenos, code)
+        return utils.hash_bytes(data.encode('utf-8'))
+
+    def highlight(self, code, lang):
+        """
+        Highlights a code block, reusing the HTML of an identical block that
+        was highlighted before.
+
+        :param code: The code in the block
+        :type code: str
+        :param lang: The language of the block
+        :type lang: str
+        :return: The highlighted HTML, or None if the block can't be
+                 highlighted (e.g. Pygments doesn't know the language)
+        :rtype: str
+        """
+        key = self.key(code, lang)
+        highlighted = self.entries.get(key)
+        if highlighted is not None:
+            self.entries.move_to_end(key)
+            return highlighted
+
+        disk_cache = self.disk_cache
+        highlighted = disk_cache.get(key) if disk_cache is not None else None
+        if highlighted is None:
+            highlighted = self._highlight(code, lang)
+            if highlighted is None:
+                return None
+            if disk_cache is not None:
+                disk_cache.set(key, highlighted)
+
+        self.entries[key] = highlighted
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return highlighted
+
+    def _highlight(self, code, lang):
+        import pygments
+
+        lexer = self.lexer(lang)
+        if lexer is None:
+            return None
+
+        try:
+            highlighted = pygments.highlight(code, lexer, self.formatter())
+        except Exception as e:
+            logger.log.debug('Unable to highlight a %s code block: %s', lang, e)
+            return None
+
+        if self.linenos:
+            return u'<div class="highlight-wrapper">{}</div>\n'.format(highlighted)
+        return highlighted
+
+
+# The highlighter used by ``nanogen.renderer``
+highlighter = Highlighter()
+
+
+def configure(**options):
+    """
+    Replaces the highlighter used to render Markdown with one created with
+    the given options (see ``Highlighter``).
+
+    :return: None
+    """
+    global highlighter
+    highlighter = Highlighter(**options)
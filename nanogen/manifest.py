@@ -0,0 +1,175 @@
+"""
+Tracks what went into a build so later builds only redo what changed.
+"""
+import json
+import os
+
+from nanogen import logger
+from nanogen import utils
+
+
+class Manifest(object):
+    """
+    An on-disk record of the inputs of the last build of an output directory.
+
+    For every post it stores the source file's mtime, size and content hash
+    along with the output file it produced. It also stores hashes of the
+    layout templates and of ``blog.cfg``; if either of those change every
+    post is considered out of date.
+    """
+    FILENAME = '.nanogen-manifest.json'
+    VERSION = 1
+
+    def __init__(self, output_dir, base_dir):
+        self.output_dir = output_dir
+        self.base_dir = base_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.inputs = {}
+        self.posts = {}
+        self.pages = {}
+        self.load()
+
+    def __repr__(self):
+        return u'{}(output_dir={}, base_dir={})'.format(
+            self.__class__.__name__,
+            self.output_dir,
+            self.base_dir
+        )
+
+    def load(self):
+        """
+        Reads the manifest from disk, if there is one.
+
+        :return: None
+        """
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except ValueError:
+            logger.log.debug('Ignoring unreadable manifest at %s', self.path)
+            return
+
+        if data.get('version') != self.VERSION:
+            return
+
+        self.inputs = data.get('inputs', {})
+        self.posts = data.get('posts', {})
+        self.pages = data.get('pages', {})
+
+    def save(self):
+        """
+        Writes the manifest to disk.
+
+        :return: None
+        """
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        data = {
+            'version': self.VERSION,
+            'inputs': self.inputs,
+            'posts': self.posts,
+            'pages': self.pages,
+        }
+        utils.write_file(self.path, json.dumps(data, indent=1, sort_keys=True))
+
+    def key(self, path):
+        return os.path.relpath(path, self.base_dir)
+
+    def check_inputs(self, **hashes):
+        """
+        Compares the given input hashes (templates, config, ...) against the
+        ones recorded by the last build. If any differ, every recorded post is
+        forgotten so that it will be rendered again.
+
+        :return: True if all the inputs are unchanged
+        :rtype: bool
+        """
+        if hashes == self.inputs:
+            return True
+
+        logger.log.debug('Build inputs changed, all posts will be rendered')
+        self.inputs = hashes
+        for entry in self.posts.values():
+            entry['hash'] = None
+        return False
+
+    def check_page_inputs(self, name, digest):
+        """
+        Compares the hash of the inputs of a group of pages (e.g. the
+        archive pages) against the one recorded by the last build, and
+        records the new hash.
+
+        :param name: The name of the group of pages
+        :type name: str
+        :param digest: The hash of the pages' inputs
+        :type digest: str
+        :return: True if the inputs are unchanged
+        :rtype: bool
+        """
+        unchanged = self.pages.get(name) == digest
+        self.pages[name] = digest
+        return unchanged
+
+    def is_current(self, post):
+        """
+        Determines whether the output of the given post is up to date.
+
+        The (cheap) mtime and size are checked first; the content hash is
+        only computed when those don't match.
+
+        :param post: The post to check
+        :type post: nanogen.models.Post
+        :rtype: bool
+        """
+        entry = self.posts.get(self.key(post.path))
+        if not entry or not entry['hash']:
+            return False
+
+        output = os.path.join(self.output_dir, entry['output'])
+        if output != post.permapath or not os.path.isfile(output):
+            return False
+
+        stat = os.stat(post.path)
+        if stat.st_mtime_ns == entry['mtime'] and stat.st_size == entry['size']:
+            return True
+
+        if utils.hash_file(post.path) == entry['hash']:
+            entry['mtime'] = stat.st_mtime_ns
+            entry['size'] = stat.st_size
+            return True
+
+        return False
+
+    def record(self, post):
+        """
+        Records the current state of the given post's source file.
+
+        :param post: The post that was just rendered
+        :type post: nanogen.models.Post
+        :return: None
+        """
+        stat = os.stat(post.path)
+        self.posts[self.key(post.path)] = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': utils.hash_file(post.path),
+            'output': os.path.relpath(post.permapath, self.output_dir)
+        }
+
+    def prune(self, current_posts):
+        """
+        Forgets every post that isn't in the given list of posts.
+
+        :param current_posts: The posts that are part of this build
+        :type current_posts: list
+        :return: The output paths of the posts that were removed
+        :rtype: list
+        """
+        current = set(self.key(post.path) for post in current_posts)
+        removed = [key for key in self.posts if key not in current]
+        return [os.path.join(self.output_dir, self.posts.pop(key)['output'])
+                for key in removed]
@@ -1,9 +1,12 @@
 """
 nanogen - a very small blog generator
 """
+import bisect
+import collections
 import datetime
 import json
 import os
+import re
 import shutil
 import subprocess
 import textwrap
@@ -13,32 +16,197 @@ try:
 except ImportError:
     import ConfigParser as configparser
 
-import jinja2
-
+from nanogen import compress
+from nanogen import highlight
 from nanogen import logger
-from nanogen import renderer
+from nanogen import manifest
+from nanogen import profiler
+from nanogen import search
 from nanogen import utils
+from nanogen import writer
 
 
 __author__ = 'Bill Israel <bill.israel@gmail.com>'
 
 
+# The optional metadata a post can have on the lines following its title
+HEADER_PATTERN = re.compile(r'^(tags|categories|summary)\s*:\s*(.*)$', re.IGNORECASE)
+
+
+class PostMeta(collections.namedtuple('PostMeta', (
+        'base_path', 'path', 'filename', 'title', 'pub_date', 'slug',
+        'html_filename', 'permalink', 'permapath', 'tags', 'categories',
+        'summary', 'header_lines'))):
+    """
+    The metadata of a post: an immutable, compact record whose derived fields
+    (date, slug, links) are computed once, when the post's file is scanned.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_file(cls, base_path, path_to_file):
+        """
+        Builds the metadata of the post at the given path, reading only the
+        title and metadata lines at the top of its file.
+
+        :param base_path: The directory the post will be written into
+        :type base_path: str
+        :param path_to_file: The path of the post's Markdown file
+        :type path_to_file: str
+        :rtype: PostMeta
+        """
+        filename = path_to_file.split('/')[-1]
+        parts = filename.split('-', 3)
+        year, month, day = map(int, parts[:3])
+        pub_date = datetime.datetime(year=year, month=month, day=day)
+        slug = '-'.join(parts[3:]).rsplit('.', 1)[0]
+        html_filename = '{}.html'.format(slug)
+        permalink = os.path.join(str(year), '{:02d}'.format(month), html_filename)
+        title, header = read_header(path_to_file)
+
+        return cls(
+            base_path=base_path,
+            path=path_to_file,
+            filename=filename,
+            title=title,
+            pub_date=pub_date,
+            slug=slug,
+            html_filename=html_filename,
+            permalink=permalink,
+            permapath=os.path.join(base_path, permalink),
+            tags=split_list(header.get('tags', '')),
+            categories=split_list(header.get('categories', '')),
+            summary=header.get('summary', ''),
+            header_lines=len(header)
+        )
+
+
+def read_header(path_to_file):
+    """
+    Reads the title of a post, and the metadata lines that may follow it,
+    without reading the rest of its file. A post with metadata looks like::
+
+        # The title
+        tags: python, web
+        categories: programming
+        summary: A short description of the post.
+
+        The content of the post.
+
+    :param path_to_file: The path of the post's Markdown file
+    :type path_to_file: str
+    :return: The title of the post, with Markdown heading markers removed,
+             and a dictionary of its metadata
+    :rtype: tuple
+    """
+    title = None
+    header = {}
+    with open(path_to_file, 'r') as p:
+        for line in p:
+            if title is None:
+                if line.strip():
+                    title = line.strip().lstrip('#').strip()
+                continue
+
+            match = HEADER_PATTERN.match(line.strip())
+            if not match or match.group(1).lower() in header:
+                break
+            header[match.group(1).lower()] = match.group(2).strip()
+    return title or '', header
+
+
+def split_list(value):
+    """Splits a comma separated metadata value into a tuple of items"""
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def _meta_property(name):
+    return property(lambda self: getattr(self.meta, name),
+                    doc='The ``{}`` of the post\'s metadata'.format(name))
+
+
 class Post(object):
     """Represents a post."""
 
-    def __init__(self, base_path, path_to_file):
+    def __init__(self, base_path, path_to_file, render_cache=None, meta=None, post_catalog=None):
         logger.log.debug('Processing post at %s', path_to_file)
-        self.base_path = base_path
-        self.path = path_to_file
-        self.filename = self.path.split('/')[-1]
+        self.meta = meta or PostMeta.from_file(base_path, path_to_file)
+        self.render_cache = render_cache
+        self.catalog = post_catalog
+
+    base_path = _meta_property('base_path')
+    path = _meta_property('path')
+    filename = _meta_property('filename')
+    title = _meta_property('title')
+    pub_date = _meta_property('pub_date')
+    slug = _meta_property('slug')
+    html_filename = _meta_property('html_filename')
+    permalink = _meta_property('permalink')
+    permapath = _meta_property('permapath')
+    tags = _meta_property('tags')
+    categories = _meta_property('categories')
+    summary = _meta_property('summary')
+
+    def read_markdown(self):
+        """
+        Reads the Markdown content of the post (everything after the title
+        and metadata).
+        Unless ``raw_content`` or ``markdown_content`` were already accessed,
+        the file is read again and nothing but the result is kept.
+
+        :rtype: str
+        """
+        if 'markdown_content' in self.__dict__:
+            return self.markdown_content
+
+        raw_content = self.__dict__.get('raw_content')
+        if raw_content is None:
+            with open(self.path, 'r') as p:
+                raw_content = p.read()
+
+        lines = raw_content.strip().splitlines()
+        return '\n'.join(lines[2 + self.meta.header_lines:]).strip()
 
+    @utils.cached_property
+    def raw_content(self):
         with open(self.path, 'r') as p:
-            self.raw_content = p.read()
+            return p.read()
+
+    @utils.cached_property
+    def markdown_content(self):
+        return self.read_markdown()
+
+    @utils.cached_property
+    def html_content(self):
+        # Only commands that render need Markdown and Pygments, so they're
+        # imported here rather than when nanogen starts
+        from nanogen import renderer
+
+        if self.catalog is not None:
+            html = self.catalog.get_html(self.path, renderer.version_string())
+            if html is not None:
+                return html
+
+        logger.log.debug('Rendering Markdown for post %s', self.path)
+        markdown = self.read_markdown()
+        if self.render_cache is not None:
+            html = self.render_cache.render(markdown)
+        else:
+            html = renderer.markdown(markdown)
+
+        if self.catalog is not None:
+            self.catalog.set_html(self.path, renderer.version_string(), html)
+        return html
+
+    def release(self):
+        """
+        Forgets the post's content (raw, Markdown and HTML), keeping only
+        its metadata. The content is read again if it's needed later.
 
-        lines = self.raw_content.strip().splitlines()
-        self.title = lines[0].lstrip('#').strip()
-        self.markdown_content = '\n'.join(lines[2:]).strip()
-        self.html_content = renderer.markdown(self.markdown_content)
+        :return: None
+        """
+        for name in ('raw_content', 'markdown_content', 'html_content'):
+            self.__dict__.pop(name, None)
 
     def __repr__(self):
         return u'{}(base_path={}, path_to_file={})'.format(
@@ -47,61 +215,423 @@ class Post(object):
             self.path
         )
 
+
+class PostCollection(object):
+    """
+    The posts of a blog, kept sorted by publication date (oldest first) so
+    that date ranges and the latest posts can be found without scanning or
+    copying every post.
+    """
+
+    def __init__(self, posts=()):
+        self._posts = sorted(posts, key=self.sort_key)
+        self._keys = [self.sort_key(post) for post in self._posts]
+        self._slugs = {}
+        # Tags and categories are indexed by slug, since that's what their
+        # pages are named after: "Python" and "python" share a page
+        self._tags = {}
+        self._categories = {}
+        # (year, month) -> the range of indexes of that month's posts
+        self._months = collections.OrderedDict()
+        for index, post in enumerate(self._posts):
+            self._slugs.setdefault(post.slug, []).append(post)
+            for tag in post.tags:
+                self._index_name(self._tags, tag, post)
+            for category in post.categories:
+                self._index_name(self._categories, category, post)
+            month = (post.pub_date.year, post.pub_date.month)
+            first = self._months[month][0] if month in self._months else index
+            self._months[month] = (first, index + 1)
+
+    def __repr__(self):
+        return u'{}(<{} posts>)'.format(self.__class__.__name__, len(self))
+
+    @staticmethod
+    def sort_key(post):
+        return (post.pub_date, post.filename)
+
+    @staticmethod
+    def _index_name(index, name, post):
+        """
+        Adds a post to the entry of a tag or category in ``index``, which maps
+        slugs to the name first used for them (by the oldest post) and their
+        posts.
+        """
+        entry = index.setdefault(utils.slugify(name), (name, []))
+        if not entry[1] or entry[1][-1] is not post:
+            entry[1].append(post)
+
+    def __len__(self):
+        return len(self._posts)
+
+    def __iter__(self):
+        return iter(self._posts)
+
+    def __reversed__(self):
+        return reversed(self._posts)
+
+    def __getitem__(self, index):
+        return self._posts[index]
+
+    def newest_first(self):
+        """
+        :return: A read-only view of the posts, newest first, that can be
+                 sliced without copying the whole collection
+        :rtype: NewestFirst
+        """
+        return NewestFirst(self._posts)
+
+    def latest(self, count, offset=0):
+        """
+        Finds the newest posts, in O(count) time.
+
+        :param count: How many posts to return
+        :type count: int
+        :param offset: How many of the newest posts to skip first
+        :type offset: int
+        :return: The posts, newest first
+        :rtype: list
+        """
+        return self.newest_first()[offset:offset + count]
+
+    def between(self, start, end):
+        """
+        Finds the posts published on or after ``start`` and before ``end``.
+
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :return: The posts, oldest first
+        :rtype: list
+        """
+        low = bisect.bisect_left(self._keys, (start,))
+        high = bisect.bisect_left(self._keys, (end,))
+        return self._posts[low:high]
+
+    def year(self, year):
+        """
+        :return: The posts published in the given year, oldest first
+        :rtype: list
+        """
+        return self.between(datetime.datetime(year, 1, 1), datetime.datetime(year + 1, 1, 1))
+
+    def month(self, year, month):
+        """
+        :return: The posts published in the given month, oldest first
+        :rtype: list
+        """
+        first, last = self._months.get((year, month), (0, 0))
+        return self._posts[first:last]
+
+    def months(self):
+        """
+        :return: The (year, month) tuples that have posts, oldest first
+        :rtype: list
+        """
+        return list(self._months)
+
+    def years(self):
+        """
+        :return: The years that have posts, oldest first
+        :rtype: list
+        """
+        return sorted(set(year for year, _ in self._months))
+
+    def by_slug(self, slug):
+        """
+        :return: The posts with the given slug, oldest first
+        :rtype: list
+        """
+        return list(self._slugs.get(slug, []))
+
+    def tags(self):
+        """
+        Tags that only differ in case or punctuation (i.e. that have the same
+        slug) are merged under the name the oldest post used.
+
+        :return: Every tag used by the posts, mapped to its posts (oldest first)
+        :rtype: dict
+        """
+        return dict(self._tags.values())
+
+    def categories(self):
+        """
+        Categories with the same slug are merged, like tags are.
+
+        :return: Every category used by the posts, mapped to its posts (oldest first)
+        :rtype: dict
+        """
+        return dict(self._categories.values())
+
+
+class NewestFirst(object):
+    """A reversed, read-only view of a list that slices in O(k) time."""
+
+    def __init__(self, items):
+        self._items = items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return reversed(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[-1 - i] for i in range(len(self._items))[index]]
+        if index < 0:
+            index += len(self._items)
+        if not 0 <= index < len(self._items):
+            raise IndexError('index out of range')
+        return self._items[-1 - index]
+
+
+class Page(object):
+    """
+    Represents one page of a (possibly paginated) listing of posts: the
+    index, or the archive or tag page in ``directory``.
+    """
+
+    def __init__(self, number, posts, total_pages, total_posts, directory=''):
+        self.number = number
+        self.posts = posts
+        self.total_pages = total_pages
+        self.total_posts = total_posts
+        self.directory = directory
+
+    def __repr__(self):
+        return u'{}(number={}, total_pages={}, directory={})'.format(
+            self.__class__.__name__,
+            self.number,
+            self.total_pages,
+            self.directory
+        )
+
+    def url_for(self, number):
+        base = '/{}/'.format(self.directory.replace(os.sep, '/')) if self.directory else '/'
+        return base if number == 1 else '{}page/{}/'.format(base, number)
+
     @property
-    def pub_date(self):
-        year, month, day = map(int, self.filename.split('-', 3)[:3])
-        return datetime.datetime(year=year, month=month, day=day)
+    def path(self):
+        if self.number == 1:
+            return os.path.join(self.directory, 'index.html')
+        return os.path.join(self.directory, 'page', str(self.number), 'index.html')
 
     @property
-    def slug(self):
-        return '-'.join(self.filename.split('-', 3)[3:]).rsplit('.', 1)[0]
+    def url(self):
+        return self.url_for(self.number)
 
     @property
-    def html_filename(self):
-        return '{}.html'.format(self.slug)
+    def has_previous(self):
+        return self.number > 1
 
     @property
-    def permapath(self):
-        dt = self.pub_date
-        return os.path.join(self.base_path, str(dt.year),
-                            '{:02d}'.format(dt.month), self.html_filename)
+    def has_next(self):
+        return self.number < self.total_pages
 
     @property
-    def permalink(self):
-        dt = self.pub_date
-        return os.path.join(str(dt.year), '{:02d}'.format(dt.month), self.html_filename)
+    def previous_url(self):
+        return self.url_for(self.number - 1) if self.has_previous else None
+
+    @property
+    def next_url(self):
+        return self.url_for(self.number + 1) if self.has_next else None
 
 
 class Blog(object):
-    def __init__(self, base_dir, is_preview=False):
+    FEED_TEMPLATES = ('rss.xml', 'feed.json')
+    ARCHIVE_TEMPLATES = ('archive_year.html', 'archive_month.html')
+    TAXONOMY_TEMPLATES = ('tag.html', 'category.html')
+    PAGE_TEMPLATES = (('post.html', 'index.html') + FEED_TEMPLATES + ARCHIVE_TEMPLATES +
+                      TAXONOMY_TEMPLATES)
+
+    # (name of the PostCollection index, output directory, listing template)
+    TAXONOMIES = (
+        ('tags', 'tag', 'tag.html'),
+        ('categories', 'category', 'category.html'),
+    )
+
+    def __init__(self, base_dir, is_preview=False, build_profiler=None):
         self.PATHS = {
             'cwd': base_dir,
             'site': os.path.join(base_dir, '_site'),
             'preview': os.path.join(base_dir, '_preview'),
             'posts': os.path.join(base_dir, '_posts'),
             'drafts': os.path.join(base_dir, '_drafts'),
-            'layout': os.path.join(base_dir, '_layout')
+            'layout': os.path.join(base_dir, '_layout'),
+            'cache': os.path.join(base_dir, '.nanogen')
         }
         
-        self.config = self.parse_config()
+        self.is_preview = is_preview
+        self.profiler = build_profiler or profiler.Profiler(enabled=False)
+        with self.profiler.phase('config'):
+            self.config = self.parse_config()
         self.output_dir = self.PATHS['preview'] if is_preview else self.PATHS['site']
-        self.posts = self.collect_posts(include_drafts=is_preview)
+        self.catalog = self.create_catalog()
+        self.configure_highlighting()
+        # The (year, month) of every post written or removed by this instance
+        self.changed_months = set()
+        # Whether pages release the content of their posts once they're
+        # written; see ``build``
+        self.stream = False
+
+    @utils.cached_property
+    def posts(self):
+        """
+        The posts of the blog, as a PostCollection sorted by publication
+        date. They're collected the first time they're needed so commands
+        that never look at posts don't pay for reading them.
+        """
+        with self.profiler.phase('collect_posts'):
+            return PostCollection(self.iter_posts(include_drafts=self.is_preview))
+
+    @utils.cached_property
+    def render_cache(self):
+        """The cache of rendered post HTML, or None if it's been disabled."""
+        return self.create_render_cache()
+
+    @utils.cached_property
+    def jinja_env(self):
+        """
+        The Jinja environment of the layout. It's created the first time a
+        template is needed, so commands that don't render anything never
+        import Jinja.
+        """
+        import jinja2
 
         jinja_loader = jinja2.FileSystemLoader(self.PATHS['layout'])
-        self.jinja_env = jinja2.Environment(loader=jinja_loader)
-        self.jinja_env.filters['to_json'] = json.dumps
+        jinja_env = jinja2.Environment(loader=jinja_loader,
+                                       bytecode_cache=self.create_bytecode_cache())
+        jinja_env.filters['to_json'] = json.dumps
+        return jinja_env
+
+    def find_template(self, name):
+        """
+        Loads a template of the layout.
+
+        :param name: The name of the template
+        :type name: str
+        :return: The template, or None if the layout doesn't have it
+        :rtype: jinja2.Template
+        """
+        import jinja2
+
+        try:
+            return self.jinja_env.get_template(name)
+        except jinja2.TemplateNotFound:
+            logger.log.debug('Unable to locate template for %s, skipping...', name)
+            return None
+
+    @utils.cached_property
+    def manifest(self):
+        """The manifest of the last build of the output directory."""
+        return manifest.Manifest(self.output_dir, self.PATHS['cwd'])
 
     def parse_config(self):
         """
         Pulls in high-level config variables about the blog.
 
+        :raises: ValueError if a setting has a value it can't have
         :return: A dictionary of configuration items
         :rtype: dict
         """
         config = configparser.ConfigParser()
         config.read(os.path.join(self.PATHS['cwd'], 'blog.cfg'))
+
+        per_page = config.getint('pagination', 'per_page', fallback=0)
+        if per_page < 0:
+            raise ValueError('[pagination] per_page must be 0 (no pagination) or more, not {}'.format(
+                per_page))
         return config
 
+    def create_render_cache(self):
+        """
+        Creates the cache of rendered post HTML, as configured by the
+        ``[cache]`` section of the config.
+
+        :return: The render cache, or None if it's been disabled
+        :rtype: nanogen.cache.RenderCache
+        """
+        from nanogen import cache
+
+        if not self.config.getboolean('cache', 'enabled', fallback=True):
+            return None
+
+        max_size_mb = self.config.getint('cache', 'max_size', fallback=None)
+        max_size = max_size_mb * 1024 * 1024 if max_size_mb else cache.RenderCache.DEFAULT_MAX_SIZE
+        return cache.RenderCache(os.path.join(self.PATHS['cache'], 'html'), max_size=max_size)
+
+    def create_bytecode_cache(self):
+        """
+        Creates the cache of compiled templates, unless caching has been
+        disabled in the ``[cache]`` section of the config.
+
+        :return: The bytecode cache, or None if it's been disabled
+        :rtype: nanogen.cache.TemplateBytecodeCache
+        """
+        from nanogen import cache
+
+        if not self.config.getboolean('cache', 'enabled', fallback=True):
+            return None
+        return cache.TemplateBytecodeCache(os.path.join(self.PATHS['cache'], 'templates'))
+
+    def configure_highlighting(self):
+        """
+        Sets up syntax highlighting of code blocks as configured by the
+        ``[highlight]`` section of the config: how many highlighted blocks
+        are kept in memory (``memory_entries``), and whether they're also
+        cached on disk (``disk_cache``, on unless caching is disabled).
+
+        :return: None
+        """
+        disk_cache = (self.config.getboolean('cache', 'enabled', fallback=True) and
+                      self.config.getboolean('highlight', 'disk_cache', fallback=True))
+        highlight.configure(
+            max_entries=self.config.getint('highlight', 'memory_entries',
+                                           fallback=highlight.DEFAULT_MAX_ENTRIES),
+            cache_dir=os.path.join(self.PATHS['cache'], 'highlight') if disk_cache else None
+        )
+
+    def create_catalog(self):
+        """
+        Creates the SQLite catalog of posts, if it's enabled in the
+        ``[catalog]`` section of the config.
+
+        :return: The catalog, or None if it isn't enabled
+        :rtype: nanogen.catalog.Catalog
+        """
+        if not self.config.getboolean('catalog', 'enabled', fallback=False):
+            return None
+
+        from nanogen import catalog
+        return catalog.Catalog(self.PATHS['cache'], PostMeta)
+
+    def iter_posts(self, include_drafts=False):
+        """
+        Lazily yields a post for each valid post file within the posts
+        directory. Only each post's title is read; the rest of its file is
+        left alone until its content is needed. With the catalog enabled,
+        only new and changed post files are read at all, and the posts are
+        yielded in order of publication.
+
+        :param include_drafts: True if draft posts should be included
+        :type include_drafts: bool
+        :return: A generator of posts
+        :rtype: generator
+        """
+        directories = [self.PATHS['posts']]
+        if include_drafts:
+            directories.append(self.PATHS['drafts'])
+
+        if self.catalog is not None:
+            self.catalog.refresh(directories)
+            for meta in self.catalog.metas(self.output_dir, directories):
+                yield Post(self.output_dir, meta.path, self.render_cache, meta, self.catalog)
+            return
+
+        for directory in directories:
+            for path in utils.iter_post_files(directory):
+                yield Post(self.output_dir, path, self.render_cache)
+
     def collect_posts(self, include_drafts=False):
         """
         Finds valid post files within the posts directory.
@@ -111,106 +641,650 @@ class Blog(object):
         :return: A list of found posts
         :rtype: list
         """
-        if not os.path.isdir(self.PATHS['posts']):
-            # There are no posts yet, so let's get outta here
-            return []
+        return list(self.iter_posts(include_drafts=include_drafts))
 
-        ls = os.listdir(self.PATHS['posts'])
-        post_path = lambda path: os.path.join(self.PATHS['posts'], path)
-        posts = [Post(self.output_dir, post_path(p))
-                 for p in ls
-                 if utils.is_valid_post_file(p)]
+    def template_dependencies(self, name):
+        """
+        Finds every template the given template extends, includes or
+        imports, directly or indirectly.
 
-        if include_drafts:
-            ls = os.listdir(self.PATHS['drafts'])
-            drafts_path = lambda path: os.path.join(self.PATHS['drafts'], path)
-            posts.extend([Post(self.output_dir, drafts_path(p))
-                          for p in ls
-                          if utils.is_valid_post_file(p)])
-        return posts
+        :param name: The name of a template in the layout directory
+        :type name: str
+        :return: The names of the template and everything it depends on
+        :rtype: set
+        """
+        import jinja2
+        import jinja2.meta
+
+        found = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in found:
+                continue
+            found.add(current)
+
+            try:
+                source = self.jinja_env.loader.get_source(self.jinja_env, current)[0]
+            except jinja2.TemplateNotFound:
+                continue
+
+            referenced = jinja2.meta.find_referenced_templates(self.jinja_env.parse(source))
+            pending.extend(ref for ref in referenced if ref is not None)
+        return found
+
+    def templates_hash(self, *names):
+        """
+        Hashes the given templates and every template they depend on.
+
+        :return: The hex digest of the templates
+        :rtype: str
+        """
+        dependencies = set()
+        for name in names:
+            dependencies.update(self.template_dependencies(name))
+
+        templates = []
+        for name in sorted(dependencies):
+            template_file = os.path.join(self.PATHS['layout'], name)
+            if os.path.isfile(template_file):
+                templates.append(u'{}:{}'.format(name, utils.hash_file(template_file)))
+        return utils.hash_bytes(u'\n'.join(templates).encode('utf-8'))
+
+    def release_posts(self, posts):
+        """
+        Forgets the content of the given posts once a page listing them has
+        been written, if the blog is being built in stream mode. The content
+        is read (from the render cache, if it's enabled) again if a later
+        page needs it.
+
+        :param posts: The posts the page listed
+        :type posts: iterable
+        :return: None
+        """
+        if self.stream:
+            for post in posts:
+                post.release()
+
+    def input_hashes(self, *templates):
+        """
+        Hashes the inputs that affect pages rendered with the given templates
+        (by default, ``post.html``): the templates, the blog config and the
+        versions of everything that renders Markdown.
+
+        :return: A dictionary of input names to hashes
+        :rtype: dict
+        """
+        from nanogen import renderer
+
+        config_file = os.path.join(self.PATHS['cwd'], 'blog.cfg')
+        return {
+            'config': utils.hash_file(config_file) if os.path.isfile(config_file) else None,
+            'templates': self.templates_hash(*(templates or ('post.html',))),
+            'renderer': renderer.version_string(),
+        }
+
+    def write_post(self, post, output=None):
+        """
+        Renders a single post with the ``post.html`` template and writes it
+        to its permapath.
+
+        :param post: The post to write
+        :type post: Post
+        :param output: The writer to hand the rendered page to; without one,
+                       the page is written before this returns
+        :type output: nanogen.writer.OutputWriter
+        :return: None
+        """
+        # Render the Markdown up front, so it's timed apart from the template
+        with self.profiler.phase('markdown', post.path):
+            post.html_content
 
-    def generate_posts(self):
+        logger.log.debug('Rendering template for post %s', post.path)
+        with self.profiler.phase('template', post.path):
+            template = self.jinja_env.get_template('post.html')
+            html = template.render(site=self.config['site'], post=post)
+
+        logger.log.debug('Writing post to %s', post.permapath)
+        # With a writer, this only times how long rendering waited for it
+        with self.profiler.phase('write', post.path):
+            if output is not None:
+                output.write(post.permapath, html)
+            else:
+                os.makedirs(os.path.dirname(post.permapath), exist_ok=True)
+                utils.write_file(post.permapath, html)
+
+    def create_writer(self):
+        """
+        Creates the writer that writes posts in the background while more
+        posts are rendered, as configured by the ``[output]`` section of the
+        config: ``threads`` writing files, and at most ``queue_size`` (at
+        least 1) pages waiting to be written.
+
+        :rtype: nanogen.writer.OutputWriter
+        """
+        return writer.OutputWriter(
+            threads=self.config.getint('output', 'threads', fallback=writer.OutputWriter.DEFAULT_THREADS),
+            max_pending=self.config.getint('output', 'queue_size',
+                                           fallback=writer.OutputWriter.DEFAULT_MAX_PENDING)
+        )
+
+    def generate_posts(self, jobs=1, stream=False):
         """
         Looks for valid post files to process and processes them.
 
+        Only posts that changed since the last build (according to the
+        build manifest in the output directory) are rendered again, and the
+        output of posts that no longer exist is removed.
+
+        :param jobs: How many processes to render posts with
+        :type jobs: int
+        :param stream: Release each post's content as soon as it's written,
+                       so memory use doesn't grow with the number of posts
+        :type stream: bool
         :return: None
         """
         logger.log.debug('Processing posts...')
+        build_manifest = self.manifest
+        build_manifest.check_inputs(**self.input_hashes())
 
+        current_outputs = set(post.permapath for post in self.posts)
+        for stale_output in build_manifest.prune(self.posts):
+            self.changed_months.add(self.output_month(stale_output))
+            if stale_output not in current_outputs and os.path.isfile(stale_output):
+                logger.log.debug('Removing output of deleted post %s', stale_output)
+                os.unlink(stale_output)
+
+        changed_posts = []
         for post in self.posts:
-            logger.log.debug('Rendering template for post %s', post.path)
-            template = self.jinja_env.get_template('post.html')
-            html = template.render(site=self.config['site'], post=post)
+            if build_manifest.is_current(post):
+                logger.log.debug('Skipping unchanged post %s', post.path)
+            else:
+                changed_posts.append(post)
+                self.changed_months.add((post.pub_date.year, post.pub_date.month))
+
+        if jobs > 1 and len(changed_posts) > 1:
+            logger.log.debug('Rendering %d posts with %d processes', len(changed_posts), jobs)
+            paths = [post.path for post in changed_posts]
+            chunksize = max(1, len(paths) // (jobs * 4))
+            initargs = (self.PATHS['cwd'], self.is_preview, self.profiler.enabled)
+            import multiprocessing
+            with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=initargs) as pool:
+                for timings in pool.imap_unordered(_write_post_in_worker, paths, chunksize):
+                    if timings:
+                        self.profiler.merge(timings)
+        elif changed_posts:
+            with self.create_writer() as output:
+                for post in changed_posts:
+                    self.write_post(post, output)
+                    if stream:
+                        post.release()
+
+        for post in changed_posts:
+            build_manifest.record(post)
+
+        build_manifest.save()
+
+    def output_month(self, output_path):
+        """
+        :return: The (year, month) of a post's output path
+        :rtype: tuple
+        """
+        parts = os.path.relpath(output_path, self.output_dir).split(os.sep)
+        return int(parts[0]), int(parts[1])
 
-            logger.log.debug('Writing post to disk: %s', post)
-            post_dir = os.path.dirname(post.permapath)
-            if not os.path.isdir(post_dir):
-                logger.log.debug('Creating post directory %s', post_dir)
-                subprocess.call(['mkdir', '-p', post_dir])
+    def generate_archives(self):
+        """
+        Generate the year (``YYYY/index.html``) and month
+        (``YYYY/MM/index.html``) archive pages, if the ``archive_year.html``
+        and ``archive_month.html`` templates exist.
+
+        Only the pages of months whose posts changed during this build are
+        rendered again, unless the archive templates or the config changed.
 
-            logger.log.debug('Writing post to %s', post.permapath)
-            with open(post.permapath, 'w') as pout:
-                pout.write(html)
+        :return: None
+        """
+        with self.profiler.phase('archives'):
+            self._generate_archives()
+        self.changed_months = set()
+
+    def _generate_archives(self):
+        templates = {}
+        for name in self.ARCHIVE_TEMPLATES:
+            template = self.find_template(name)
+            if template is not None:
+                templates[name] = template
+        if not templates:
+            return
+
+        logger.log.debug('Writing archive pages...')
+        inputs = self.input_hashes(*self.ARCHIVE_TEMPLATES)
+        digest = u'{config}:{templates}:{renderer}'.format(**inputs)
+
+        if self.manifest.check_page_inputs('archives', digest):
+            months = self.changed_months
+        else:
+            months = set(self.posts.months())
+        years = set(year for year, _ in months)
+
+        for year, month in sorted(months):
+            directory = os.path.join(str(year), '{:02d}'.format(month))
+            posts = list(reversed(self.posts.month(year, month)))
+            self._write_archive_page(templates.get('archive_month.html'), directory, posts,
+                                     year=year, month=month, date=datetime.datetime(year, month, 1))
+
+        for year in sorted(years):
+            posts = list(reversed(self.posts.year(year)))
+            year_months = [datetime.datetime(year, month, 1)
+                           for post_year, month in self.posts.months() if post_year == year]
+            self._write_archive_page(templates.get('archive_year.html'), str(year), posts,
+                                     year=year, months=year_months)
+
+        self.manifest.save()
+
+    def _write_archive_page(self, template, directory, posts, **context):
+        if template is None:
+            return
+
+        if not posts:
+            output_file = os.path.join(self.output_dir, directory, 'index.html')
+            pages_dir = os.path.join(self.output_dir, directory, 'page')
+            if os.path.isfile(output_file):
+                logger.log.debug('Removing empty archive page %s', output_file)
+                os.unlink(output_file)
+            if os.path.isdir(pages_dir):
+                shutil.rmtree(pages_dir)
+            return
+
+        logger.log.debug('Writing archive pages to %s', directory)
+        self._write_listing(template, directory, posts, **context)
 
     def generate_index_page(self):
         """
         Generate the index page of posts.
 
+        If ``per_page`` is set in the ``[pagination]`` section of the config,
+        the posts are split across ``index.html``, ``page/2/index.html``,
+        ``page/3/index.html`` and so on.
+
         :return: None
         """
+        with self.profiler.phase('index'):
+            self._generate_index_page()
+
+    def _generate_index_page(self):
         logger.log.debug('Writing index page...')
-        posts = self.posts
+        self._write_listing(self.jinja_env.get_template('index.html'), '', self.posts.newest_first())
 
-        logger.log.debug('Rendering index.html')
-        output_file = os.path.join(self.output_dir, 'index.html')
-        template = self.jinja_env.get_template('index.html')
-        html = template.render(site=self.config['site'], posts=list(reversed(posts)))
+    def _write_listing(self, template, directory, posts, **context):
+        """
+        Renders a listing of posts (the index, an archive or a tag page) into
+        ``directory``. If ``per_page`` is set in the ``[pagination]`` section
+        of the config, the posts are split across ``index.html``,
+        ``page/2/index.html`` and so on, and each page gets a ``Page`` as
+        ``page``.
+
+        :param template: The template to render each page with
+        :type template: jinja2.Template
+        :param directory: The directory of the listing within the output
+                          directory
+        :type directory: str
+        :param posts: The posts to list, in order; a sequence
+        :type posts: list
+        :return: None
+        """
+        per_page = self.config.getint('pagination', 'per_page', fallback=0) or len(posts) or 1
+        total_pages = max(1, (len(posts) + per_page - 1) // per_page)
+
+        for number in range(1, total_pages + 1):
+            page_posts = posts[(number - 1) * per_page:number * per_page]
+            page = Page(number, page_posts, total_pages, len(posts), directory)
+
+            logger.log.debug('Rendering %s for page %d', page.path, number)
+            output_file = os.path.join(self.output_dir, page.path)
+            html = template.render(site=self.config['site'], posts=page_posts, page=page, **context)
+
+            logger.log.debug('Writing page to disk: %s', page.path)
+            output_dir = os.path.dirname(output_file)
+            if not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+            utils.write_file(output_file, html)
+            self.release_posts(page_posts)
+
+        # Remove pages left over from builds that had more of them
+        pages_dir = os.path.join(self.output_dir, directory, 'page')
+        if os.path.isdir(pages_dir):
+            for name in os.listdir(pages_dir):
+                if not name.isdigit() or int(name) > total_pages or int(name) < 2:
+                    logger.log.debug('Removing stale page %s of %s', name, directory or 'the index')
+                    shutil.rmtree(os.path.join(pages_dir, name))
+
+    @utils.cached_property
+    def feed_writers(self):
+        """
+        The built-in feed writers, if they're enabled with ``native`` in the
+        ``[feeds]`` section of the config, or None if feeds are rendered with
+        the layout's templates.
 
-        logger.log.debug('Writing page to disk: index.html')
-        with open(output_file, 'w') as pout:
-            pout.write(html)
+        The section also sets the ``formats`` to write (``rss``, ``atom``
+        and ``json``), the ``limit`` of posts in each feed and whether feeds
+        hold each post's ``full`` content or just its ``summary``.
+        """
+        if not self.config.getboolean('feeds', 'native', fallback=False):
+            return None
+
+        from nanogen import feeds
+        return feeds.create_writers(
+            self.config['site'],
+            formats=split_list(self.config.get('feeds', 'formats', fallback='rss, json')),
+            limit=self.config.getint('feeds', 'limit', fallback=feeds.DEFAULT_LIMIT),
+            content=self.config.get('feeds', 'content', fallback='full')
+        )
 
     def generate_feeds(self):
         """
-        Generate RSS and JSON feed files, if templates for them exist.
+        Generate RSS and JSON feed files, if templates for them exist, or
+        with the built-in feed writers (see ``feed_writers``).
 
         :return: None
         """
+        with self.profiler.phase('feeds'):
+            self._generate_feeds()
+
+    def _generate_feeds(self):
         logger.log.debug('Writing feed pages...')
-        posts = self.posts
+        # Items cached by an earlier build may belong to posts that changed
+        self.clear_feed_items()
+        self._write_feeds(self.posts.newest_first())
 
-        for feed in ('rss.xml', 'feed.json'):
-            logger.log.debug('Rendering index.html')
-            output_file = os.path.join(self.output_dir, feed)
+    def clear_feed_items(self):
+        """
+        Forgets the feed items the built-in feed writers cached while writing
+        the site's feeds and those of its tags and categories.
 
-            try:
-                template = self.jinja_env.get_template(feed)
-            except jinja2.TemplateNotFound:
-                logger.log.debug('Unable to locate template for %s, skipping...', feed)
+        :return: None
+        """
+        if self.feed_writers is not None:
+            for feed_writer in self.feed_writers:
+                feed_writer.clear_items()
+
+    def _write_feeds(self, posts, directory='', title=None, **context):
+        if self.feed_writers is not None:
+            for feed_writer in self.feed_writers:
+                feed_path = os.path.join(directory, feed_writer.FILENAME)
+                logger.log.debug('Writing feed to disk: %s', feed_path)
+                # In stream mode, keeping every post's item would keep every
+                # post's content in memory
+                feed_writer.write(os.path.join(self.output_dir, feed_path), posts, feed_path, title,
+                                  cache=not self.stream)
+            self.release_posts(posts)
+            return
+
+        for feed in self.FEED_TEMPLATES:
+            logger.log.debug('Rendering %s', feed)
+            feed_path = os.path.join(directory, feed)
+            output_file = os.path.join(self.output_dir, feed_path)
+
+            template = self.find_template(feed)
+            if template is None:
                 continue
 
-            html = template.render(site=self.config['site'], posts=list(reversed(posts)))
+            html = template.render(site=self.config['site'], posts=posts,
+                                   feed_path=feed_path, **context)
+
+            logger.log.debug('Writing page to disk: %s', feed_path)
+            utils.write_file(output_file, html)
+        self.release_posts(posts)
+
+    def generate_taxonomies(self):
+        """
+        Generate a listing page and feeds for every tag and category used by
+        the posts: ``tag/<tag>/index.html``, ``tag/<tag>/rss.xml`` and so on.
+        Listing pages are only generated if the ``tag.html`` or
+        ``category.html`` templates exist, and are paginated like the index.
+
+        :return: None
+        """
+        with self.profiler.phase('taxonomies'):
+            self._generate_taxonomies()
+        # The taxonomies' feeds are the last ones a build writes
+        self.clear_feed_items()
+
+    def _generate_taxonomies(self):
+        for index_name, directory, template_name in self.TAXONOMIES:
+            index = getattr(self.posts, index_name)()
+            base_dir = os.path.join(self.output_dir, directory)
+
+            template = self.find_template(template_name)
+
+            slugs = set()
+            for name, posts in index.items():
+                slug = utils.slugify(name)
+                slugs.add(slug)
+                page_dir = os.path.join(base_dir, slug)
+                if not os.path.isdir(page_dir):
+                    os.makedirs(page_dir)
+
+                newest = NewestFirst(posts)
+                context = {directory: name}
+                self._write_feeds(newest, os.path.join(directory, slug), title=name, **context)
+                if template is not None:
+                    logger.log.debug('Writing %s pages for %s', directory, name)
+                    self._write_listing(template, os.path.join(directory, slug), newest, **context)
+
+            # Remove the pages of tags and categories no post uses anymore
+            if os.path.isdir(base_dir):
+                for slug in os.listdir(base_dir):
+                    if slug not in slugs:
+                        logger.log.debug('Removing stale %s page %s', directory, slug)
+                        shutil.rmtree(os.path.join(base_dir, slug))
+
+    def generate_search_index(self):
+        """
+        Generate a static search index of the posts' titles and content, if
+        it's enabled in the ``[search]`` section of the config. See
+        ``nanogen.search.SearchIndex`` for its format.
+
+        :return: None
+        """
+        with self.profiler.phase('search'):
+            index = search.SearchIndex(
+                self.output_dir,
+                os.path.join(self.PATHS['cache'], 'search-{}.json'.format(
+                    'preview' if self.is_preview else 'site')),
+                prefix_length=self.config.getint('search', 'prefix_length', fallback=2),
+                compress=self.config.getboolean('search', 'gzip', fallback=False)
+            )
+            if self.config.getboolean('search', 'enabled', fallback=False):
+                logger.log.debug('Writing search index...')
+                index.build(self.posts.newest_first())
+            else:
+                index.clear()
 
-            logger.log.debug('Writing page to disk: %s', feed)
-            with open(output_file, 'w') as pout:
-                pout.write(html)
+    def generate_highlight_css(self):
+        """
+        Write the style sheet for highlighted code to ``pygments.css``, if
+        ``css`` is turned on in the ``[highlight]`` section of the config.
+        ``style`` picks the Pygments style (``default`` by default).
+
+        :return: None
+        """
+        output_file = os.path.join(self.output_dir, 'pygments.css')
+        if not self.config.getboolean('highlight', 'css', fallback=False):
+            if os.path.isfile(output_file):
+                os.unlink(output_file)
+            return
+
+        logger.log.debug('Writing the style sheet for highlighted code...')
+        utils.write_file(output_file, highlight.css(self.config.get('highlight', 'style', fallback='default')))
 
     def copy_static_files(self):
         """
-        Copy static files into the output directory.
+        Copy static files into the output directory. Only files that changed
+        since the last build are copied, and files that were removed from the
+        layout are removed from the output directory.
+
+        How files are compared and copied can be set in the ``[static]``
+        section of the config: ``checksum`` compares the contents of files
+        whose mtimes differ, and ``link`` can be ``reflink`` (the default),
+        ``hardlink`` or ``copy``.
 
         :return: None
         """
+        with self.profiler.phase('static'):
+            self._copy_static_files()
+
+    def _copy_static_files(self):
         layout_static = os.path.join(self.PATHS['layout'], 'static')
         output_static = os.path.join(self.output_dir, 'static')
 
         if not os.path.isdir(layout_static):
+            if os.path.isdir(output_static):
+                shutil.rmtree(output_static)
             return
 
-        if os.path.isdir(os.path.join(output_static)):
-            shutil.rmtree(output_static)
+        copied, removed = utils.sync_tree(
+            layout_static,
+            output_static,
+            checksum=self.config.getboolean('static', 'checksum', fallback=False),
+            link=self.config.get('static', 'link', fallback='reflink'),
+            keep_suffixes=compress.SUFFIXES
+        )
+        logger.log.debug('Copied %d static files and removed %d', copied, removed)
 
-        shutil.copytree(layout_static, output_static)
+    def copy_static_file(self, path):
+        """
+        Copy a single static file into the output directory, or remove its
+        copy if the file no longer exists.
+
+        :param path: The path of a file within the layout's static directory
+        :type path: str
+        :return: None
+        """
+        layout_static = os.path.join(self.PATHS['layout'], 'static')
+        output_path = os.path.join(self.output_dir, 'static', os.path.relpath(path, layout_static))
+
+        if os.path.isfile(path):
+            logger.log.debug('Copying static file %s', path)
+            utils.copy_file(path, output_path, self.config.get('static', 'link', fallback='reflink'))
+        elif os.path.isfile(output_path):
+            logger.log.debug('Removing static file %s', output_path)
+            os.unlink(output_path)
+
+    def compress_output(self, force=False):
+        """
+        Write gzip (and, if the ``brotli`` module is installed, brotli)
+        compressed siblings of the generated HTML, XML, JSON, CSS and
+        JavaScript files, so a static web server can serve them as they are.
+
+        Compression is turned on in the ``[compress]`` section of the config,
+        which also sets the ``min_size`` (in bytes) of the files to compress
+        and the ``formats`` to write. Only files that changed since the last
+        build are compressed. When compression is off, the compressed files
+        an earlier build wrote are removed, since they'd be out of date.
+
+        :param force: Compress even if it isn't enabled in the config
+        :type force: bool
+        :return: None
+        """
+        exclude = ()
+        if self.config.getboolean('search', 'gzip', fallback=False):
+            # The search index compresses its shards itself
+            exclude = (os.path.join(self.output_dir, 'search', 'shards'),)
+
+        if not (force or self.config.getboolean('compress', 'enabled', fallback=False)):
+            compress.remove_compressed(self.output_dir, exclude=exclude)
+            return
+
+        formats = compress.available_formats(
+            split_list(self.config.get('compress', 'formats', fallback='gzip, brotli')))
+
+        with self.profiler.phase('compress'):
+            compress.compress_tree(
+                self.output_dir,
+                formats=formats,
+                min_size=self.config.getint('compress', 'min_size', fallback=compress.DEFAULT_MIN_SIZE),
+                exclude=exclude
+            )
+
+    def watched_paths(self):
+        """
+        The files and directories whose changes should trigger a rebuild.
+
+        :rtype: list
+        """
+        paths = [self.PATHS['posts'], self.PATHS['layout'], os.path.join(self.PATHS['cwd'], 'blog.cfg')]
+        if self.is_preview:
+            paths.append(self.PATHS['drafts'])
+        return paths
+
+    def reload_config(self):
+        """
+        Reads ``blog.cfg`` again, and forgets or sets up again everything
+        that was created from the old config.
+
+        :return: None
+        """
+        self.config = self.parse_config()
+        for name in ('posts', 'feed_writers', 'render_cache', 'jinja_env'):
+            self.__dict__.pop(name, None)
+        if self.catalog is not None:
+            self.catalog.close()
+        self.catalog = self.create_catalog()
+        self.configure_highlighting()
+
+    def rebuild(self, changed_paths):
+        """
+        Regenerates only the parts of the site affected by the given changed
+        files:
+
+        * a changed ``blog.cfg`` rebuilds the whole site
+        * a changed post re-renders that post, the index page and the feeds
+        * a changed static file is copied (or removed) on its own
+        * a changed template re-renders the pages that use it
+
+        :param changed_paths: Paths of files that were added, modified or removed
+        :type changed_paths: iterable
+        :return: None
+        """
+        layout_static = os.path.join(self.PATHS['layout'], 'static')
+        post_dirs = (self.PATHS['posts'], self.PATHS['drafts'])
+
+        changed_posts = False
+        changed_templates = set()
+        for path in changed_paths:
+            if path == os.path.join(self.PATHS['cwd'], 'blog.cfg'):
+                logger.log.info('Config changed, rebuilding the site...')
+                self.reload_config()
+                self.build()
+                return
+            elif os.path.dirname(path) in post_dirs:
+                changed_posts = True
+            elif path.startswith(layout_static + os.sep):
+                self.copy_static_file(path)
+            elif path.startswith(self.PATHS['layout'] + os.sep):
+                changed_templates.add(os.path.relpath(path, self.PATHS['layout']))
+
+        affected = set(name for name in self.PAGE_TEMPLATES
+                       if self.template_dependencies(name) & changed_templates)
+
+        if changed_posts:
+            logger.log.info('Posts changed, rebuilding posts, index and feeds...')
+            self.__dict__.pop('posts', None)
+            affected.update(self.PAGE_TEMPLATES)
+            self.generate_search_index()
+
+        if 'post.html' in affected:
+            self.generate_posts()
+        if 'index.html' in affected:
+            self.generate_index_page()
+        if affected.intersection(self.FEED_TEMPLATES):
+            self.generate_feeds()
+        if affected.intersection(self.ARCHIVE_TEMPLATES):
+            self.generate_archives()
+        if affected.intersection(self.FEED_TEMPLATES + self.TAXONOMY_TEMPLATES):
+            self.generate_taxonomies()
+        self.compress_output()
 
     def init(self):
         """
@@ -234,20 +1308,35 @@ class Blog(object):
             else:
                 shutil.copy2(source, dest)
 
-    def build(self):
+    def build(self, jobs=1, stream=False, compress_output=False):
         """
         Generate the site. Will create the output dir if necessary.
 
+        :param jobs: How many processes to render posts with
+        :type jobs: int
+        :param stream: Keep only post metadata in memory: each post's content
+                       is released as soon as the page being written no
+                       longer needs it
+        :type stream: bool
+        :param compress_output: Write compressed siblings of the output files
+                                even if it isn't enabled in the config
+        :type compress_output: bool
         :return: None
         """
         if not os.path.isdir(self.output_dir):
             logger.log.debug('Creating output directory...')
-            subprocess.call(['mkdir', self.output_dir])
+            os.makedirs(self.output_dir)
 
-        self.generate_posts()
+        self.stream = stream
+        self.generate_posts(jobs=jobs, stream=stream)
         self.generate_index_page()
         self.generate_feeds()
+        self.generate_archives()
+        self.generate_taxonomies()
+        self.generate_search_index()
+        self.generate_highlight_css()
         self.copy_static_files()
+        self.compress_output(force=compress_output)
 
     def clean(self):
         """
@@ -258,6 +1347,7 @@ class Blog(object):
         logger.log.info('Cleaning generated files...')
         if os.path.isdir(self.output_dir):
             subprocess.call(['rm', '-r', self.output_dir])
+        self.__dict__.pop('manifest', None)
 
     def new_post(self, title, draft=False):
         """
@@ -328,3 +1418,25 @@ class Blog(object):
             os.path.join(drafts_dir, filename_with_ext),
             os.path.join(posts_dir, post_filename)
         )
+
+
+# Each process in the pool used by ``Blog.generate_posts`` gets its own Blog
+# (and so its own Jinja environment), created once when the process starts.
+_worker_blog = None
+
+
+def _init_worker(base_dir, is_preview, profile):
+    global _worker_blog
+    _worker_blog = Blog(base_dir, is_preview=is_preview,
+                        build_profiler=profiler.Profiler(enabled=profile))
+
+
+def _write_post_in_worker(path):
+    """
+    Writes a single post and returns the time spent on it, if profiling.
+    """
+    _worker_blog.profiler = profiler.Profiler(enabled=_worker_blog.profiler.enabled)
+    post = Post(_worker_blog.output_dir, path, _worker_blog.render_cache,
+                post_catalog=_worker_blog.catalog)
+    _worker_blog.write_post(post)
+    return _worker_blog.profiler.to_dict() if _worker_blog.profiler.enabled else None
@@ -0,0 +1,110 @@
+"""
+Timing instrumentation for the phases of a build.
+"""
+import contextlib
+import json
+import time
+
+
+class Profiler(object):
+    """
+    Accumulates the wall time and number of calls of each named phase of a
+    build, along with the time spent on each individual post.
+
+    A disabled profiler (the default for a Blog) does no timing at all.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = {}
+        self.items = {}
+
+    def __repr__(self):
+        return u'{}(enabled={})'.format(self.__class__.__name__, self.enabled)
+
+    @contextlib.contextmanager
+    def phase(self, name, item=None):
+        """
+        Times the enclosed block as one call of the named phase.
+
+        :param name: The name of the phase
+        :type name: str
+        :param item: What's being processed (e.g. a post's path), if the time
+                     should also be counted towards that item
+        :type item: str
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, item)
+
+    def add(self, name, seconds, item=None, calls=1):
+        """
+        Records time spent on a phase.
+
+        :return: None
+        """
+        total, count = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + seconds, count + calls)
+        if item is not None:
+            self.items[item] = self.items.get(item, 0.0) + seconds
+
+    def merge(self, data):
+        """
+        Adds the timings of another profiler, as returned by its ``to_dict``.
+
+        :param data: The timings to add
+        :type data: dict
+        :return: None
+        """
+        for name, phase in data['phases'].items():
+            self.add(name, phase['seconds'], calls=phase['calls'])
+        for item, seconds in data['items'].items():
+            self.items[item] = self.items.get(item, 0.0) + seconds
+
+    def slowest(self, count=10):
+        """
+        :return: The ``count`` slowest items as (item, seconds) tuples
+        :rtype: list
+        """
+        return sorted(self.items.items(), key=lambda entry: entry[1], reverse=True)[:count]
+
+    def to_dict(self):
+        return {
+            'phases': dict((name, {'seconds': total, 'calls': calls})
+                           for name, (total, calls) in self.phases.items()),
+            'items': dict(self.items),
+        }
+
+    def dump_json(self, path):
+        """
+        Writes the timings to a JSON file, e.g. for tracking them in CI.
+
+        :return: None
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def report(self, top=10):
+        """
+        Formats the timings as a human readable table.
+
+        :param top: How many of the slowest items to list
+        :type top: int
+        :rtype: str
+        """
+        lines = ['{:<16}{:>8}{:>12}{:>12}'.format('Phase', 'Calls', 'Total (s)', 'Mean (ms)')]
+        for name, (total, calls) in sorted(self.phases.items(), key=lambda p: p[1][0], reverse=True):
+            lines.append('{:<16}{:>8}{:>12.3f}{:>12.2f}'.format(
+                name, calls, total, 1000.0 * total / calls if calls else 0.0))
+
+        slowest = self.slowest(top)
+        if slowest:
+            lines.extend(['', 'Slowest {} posts:'.format(len(slowest))])
+            lines.extend('{:>10.3f}s  {}'.format(seconds, item) for item, seconds in slowest)
+        return '\n'.join(lines)
@@ -1,8 +1,51 @@
 import mistune
-from mistune_contrib import highlight
+import pygments
 
+from nanogen import highlight
+from nanogen import version
 
-class NanogenRenderer(highlight.HighlightMixin, mistune.Renderer):
-    pass
 
-markdown = mistune.Markdown(renderer=NanogenRenderer(inlinestyles=False, linenos=False))
+# Bump this whenever a change to NanogenRenderer changes the HTML it renders,
+# so that previously cached HTML is no longer used.
+RENDERER_VERSION = 2
+
+
+class NanogenRenderer(mistune.Renderer):
+
+    def block_code(self, code, lang=None):
+        if not lang:
+            return u'<pre><code>{}</code></pre>\n'.format(mistune.escape(code.strip()))
+
+        highlighted = highlight.highlighter.highlight(code, lang)
+        if highlighted is None:
+            return u'<pre class="{}"><code>{}</code></pre>\n'.format(
+                mistune.escape(lang), mistune.escape(code))
+        return highlighted
+
+
+_markdown = None
+
+
+def markdown(text):
+    """
+    Renders Markdown to HTML. The Markdown parser is only created the first
+    time something is rendered.
+
+    :param text: The Markdown to render
+    :type text: str
+    :rtype: str
+    """
+    global _markdown
+    if _markdown is None:
+        _markdown = mistune.Markdown(renderer=NanogenRenderer())
+    return _markdown(text)
+
+
+def version_string():
+    """Describe every version that affects the HTML rendered from Markdown"""
+    return 'nanogen={} renderer={} mistune={} pygments={}'.format(
+        version.version,
+        RENDERER_VERSION,
+        mistune.__version__,
+        pygments.__version__
+    )
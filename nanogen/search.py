@@ -0,0 +1,193 @@
+"""
+Builds a static, sharded search index that a small client-side script can
+query without a search server.
+"""
+import json
+import os
+import re
+import shutil
+
+from nanogen import logger
+from nanogen import utils
+
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# How much more a term in a post's title counts than a term in its content
+TITLE_WEIGHT = 10
+
+
+def tokenize(text, min_length=2):
+    """
+    Splits text into lowercase search terms.
+
+    :param text: The text to split
+    :type text: str
+    :param min_length: The length of the shortest term to keep
+    :type min_length: int
+    :return: A dictionary of terms to the number of times they occur
+    :rtype: dict
+    """
+    counts = {}
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) >= min_length:
+            counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def shard_name(prefix):
+    """
+    The file name of the shard for the given term prefix. Prefixes that
+    aren't plain ASCII letters and digits are hex encoded.
+
+    :rtype: str
+    """
+    if re.match(r'^[a-z0-9]+$', prefix):
+        return prefix
+    return '_' + utils.hash_bytes(prefix.encode('utf-8'))[:12]
+
+
+class SearchIndex(object):
+    """
+    An inverted index of the terms in the posts' titles and content.
+
+    The index is written into ``search/`` in the output directory:
+
+    * ``meta.json`` maps each term prefix to the file of its shard
+    * ``docs.json`` lists the title, URL and date of every post
+    * ``shards/<prefix>.json`` maps every term starting with ``<prefix>`` to
+      a list of ``[document number, score]`` pairs
+
+    The terms of each post are cached, so only posts that changed since the
+    last build are tokenized again.
+    """
+    VERSION = 1
+
+    def __init__(self, output_dir, cache_file, prefix_length=2, compress=False):
+        self.output_dir = os.path.join(output_dir, 'search')
+        self.cache_file = cache_file
+        self.prefix_length = prefix_length
+        self.compress = compress
+        self.cache = self.load_cache()
+
+    def __repr__(self):
+        return u'{}(output_dir={}, prefix_length={}, compress={})'.format(
+            self.__class__.__name__,
+            self.output_dir,
+            self.prefix_length,
+            self.compress
+        )
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return data.get('posts', {}) if data.get('version') == self.VERSION else {}
+
+    def save_cache(self):
+        cache_dir = os.path.dirname(self.cache_file)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        data = {'version': self.VERSION, 'posts': self.cache}
+        utils.write_file(self.cache_file, json.dumps(data, sort_keys=True))
+
+    def terms_for(self, post):
+        """
+        Finds the scored terms of a post, tokenizing it only if it changed
+        since its terms were cached.
+
+        :param post: The post to index
+        :type post: nanogen.models.Post
+        :return: A dictionary of terms to scores
+        :rtype: dict
+        """
+        stat = os.stat(post.path)
+        entry = self.cache.get(post.path)
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['terms']
+
+        digest = utils.hash_file(post.path)
+        if entry and entry['hash'] == digest:
+            entry.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+            return entry['terms']
+
+        logger.log.debug('Tokenizing post %s for the search index', post.path)
+        terms = tokenize(post.read_markdown())
+        for term, count in tokenize(post.title).items():
+            terms[term] = terms.get(term, 0) + count * TITLE_WEIGHT
+
+        self.cache[post.path] = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': digest,
+            'terms': terms,
+        }
+        return terms
+
+    def build(self, posts):
+        """
+        Indexes the given posts and writes the index.
+
+        :param posts: The posts to index, in the order they should be listed
+        :type posts: iterable
+        :return: None
+        """
+        docs = []
+        shards = {}
+        current = set()
+        for number, post in enumerate(posts):
+            current.add(post.path)
+            docs.append({
+                'title': post.title,
+                'url': '/' + post.permalink,
+                'date': post.pub_date.strftime('%Y-%m-%d'),
+            })
+            for term, score in self.terms_for(post).items():
+                shard = shards.setdefault(term[:self.prefix_length], {})
+                shard.setdefault(term, []).append([number, score])
+
+        for path in [path for path in self.cache if path not in current]:
+            del self.cache[path]
+
+        self.write(docs, shards)
+        self.save_cache()
+
+    def write(self, docs, shards):
+        shards_dir = os.path.join(self.output_dir, 'shards')
+        if not os.path.isdir(shards_dir):
+            os.makedirs(shards_dir)
+
+        extension = '.json.gz' if self.compress else '.json'
+        files = {}
+        for prefix, terms in shards.items():
+            filename = shard_name(prefix) + extension
+            files[prefix] = 'shards/' + filename
+            self.write_json(os.path.join(shards_dir, filename), terms, self.compress)
+
+        # Remove shards of prefixes that no longer have any terms
+        expected = set(os.path.basename(path) for path in files.values())
+        for filename in os.listdir(shards_dir):
+            if filename not in expected:
+                os.unlink(os.path.join(shards_dir, filename))
+
+        meta = {'version': self.VERSION, 'prefix_length': self.prefix_length, 'shards': files}
+        self.write_json(os.path.join(self.output_dir, 'meta.json'), meta)
+        self.write_json(os.path.join(self.output_dir, 'docs.json'), docs)
+
+    @staticmethod
+    def write_json(path, data, compress=False):
+        content = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        if compress:
+            content = utils.gzip_bytes(content)
+        utils.write_file(path, content)
+
+    def clear(self):
+        """
+        Removes the written index.
+
+        :return: None
+        """
+        if os.path.isdir(self.output_dir):
+            shutil.rmtree(self.output_dir)
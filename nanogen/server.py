@@ -0,0 +1,233 @@
+"""
+The HTTP server behind ``nanogen preview``.
+"""
+import collections
+import email.utils
+import http.server
+import io
+import os
+import posixpath
+import socketserver
+import threading
+import urllib.parse
+
+from nanogen import logger
+
+
+class FileCache(object):
+    """
+    A thread-safe, in-memory LRU cache of file contents.
+
+    Entries are keyed by path and remember the mtime and size the file had
+    when it was read, so a file changed by a rebuild is read again rather than
+    served stale. Files bigger than ``max_file_size`` bytes aren't cached.
+    """
+    DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+    DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_file_size=DEFAULT_MAX_FILE_SIZE):
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return u'{}(max_size={}, max_file_size={})'.format(
+            self.__class__.__name__,
+            self.max_size,
+            self.max_file_size
+        )
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, path, stat):
+        """
+        Reads a file, from the cache if it hasn't changed since it was cached.
+
+        :param path: The file to read
+        :type path: str
+        :param stat: The result of ``os.stat`` for the file
+        :type stat: os.stat_result
+        :return: The contents of the file
+        :rtype: bytes
+        """
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(path)
+                return entry[1]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if len(data) <= self.max_file_size:
+            with self.lock:
+                self.discard(path)
+                self.entries[path] = (version, data)
+                self.size += len(data)
+                while self.size > self.max_size:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return data
+
+    def discard(self, path):
+        """Removes a path from the cache; the caller must hold ``lock``."""
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the files of a directory over HTTP/1.1 with keep-alive.
+
+    Every file gets an ``ETag`` and a ``Last-Modified`` header, and
+    conditional requests for files that haven't changed get a
+    ``304 Not Modified``. When the client accepts it, an up-to-date ``.br`` or
+    ``.gz`` sibling (see ``nanogen.compress``) is served in place of the file.
+
+    Files are served from the server's ``directory`` and read through its
+    ``file_cache``.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    # Content-Encoding -> sibling suffix, in order of preference
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def translate_path(self, path):
+        """
+        Maps a URL path to a file in the server's directory, ignoring any
+        ``..`` that would escape it (``SimpleHTTPRequestHandler`` only serves
+        the current working directory before Python 3.7).
+        """
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        trailing_slash = path.rstrip().endswith('/')
+        path = posixpath.normpath(urllib.parse.unquote(path))
+
+        parts = [part for part in path.split('/')
+                 if part and not os.path.dirname(part) and part not in (os.curdir, os.pardir)]
+        path = os.path.join(self.server.directory, *parts)
+        if trailing_slash:
+            path += '/'
+        return path
+
+    def accepted_encodings(self):
+        header = self.headers.get('Accept-Encoding', '')
+        encodings = set()
+        for item in header.split(','):
+            parts = item.strip().split(';')
+            if parts[0] and not any(p.strip() in ('q=0', 'q=0.0') for p in parts[1:]):
+                encodings.add(parts[0].strip().lower())
+        return encodings
+
+    def find_encoded(self, path, stat):
+        """
+        Finds a compressed sibling of a file that the client accepts and that
+        is as new as the file.
+
+        :return: (encoding, path, stat) of the sibling, or None
+        :rtype: tuple
+        """
+        accepted = self.accepted_encodings()
+        for encoding, suffix in self.ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                sibling_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if sibling_stat.st_mtime_ns == stat.st_mtime_ns:
+                return encoding, path + suffix, sibling_stat
+        return None
+
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or 'W/' + etag in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError):
+                return False
+            return since is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not self.path.split('?', 1)[0].endswith('/') or not os.path.isfile(index):
+                # Redirects and directory listings
+                return super(PreviewRequestHandler, self).send_head()
+            path = index
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(404, 'File not found')
+            return None
+
+        content_type = self.guess_type(path)
+        encoding = None
+        encoded = self.find_encoded(path, stat)
+        if encoded is not None:
+            encoding, path, stat = encoded
+
+        etag = '"{:x}-{:x}{}"'.format(stat.st_mtime_ns, stat.st_size,
+                                      '-' + encoding if encoding else '')
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+        if self.is_not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+
+        try:
+            data = self.server.file_cache.read(path, stat)
+        except (IOError, OSError):
+            self.send_error(404, 'File not found')
+            return None
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        # The preview changes whenever the site is rebuilt, so browsers should
+        # always revalidate (which is cheap, thanks to the ETag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return io.BytesIO(data)
+
+
+class PreviewServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    Serves a directory with a thread per connection, so a slow client or an
+    idle keep-alive connection doesn't hold up anyone else.
+    """
+    daemon_threads = True
+
+    def __init__(self, directory, host='localhost', port=8080, file_cache=None):
+        self.directory = directory
+        self.file_cache = file_cache if file_cache is not None else FileCache()
+        super(PreviewServer, self).__init__((host, port), PreviewRequestHandler)
+        logger.log.debug('Serving %s on %s:%d', directory, host, self.server_address[1])
+
+    def __repr__(self):
+        return u'{}(directory={}, address={})'.format(
+            self.__class__.__name__,
+            self.directory,
+            self.server_address
+        )
@@ -1,5 +1,21 @@
+import binascii
+import contextlib
+import gzip
+import hashlib
+import io
 import os
 import re
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# The Linux ioctl that makes a copy-on-write clone of a file (a "reflink") on
+# filesystems that support it, like btrfs and XFS.
+FICLONE = 0x40049409
 
 
 def slugify(text):
@@ -32,3 +48,320 @@ def is_valid_post_file(basename):
     valid_extension = ext in markdown_extensions
 
     return not ignorable and valid_filename and valid_extension
+
+
+def iter_post_files(directory):
+    """
+    Yields the path of every valid post file in the given directory.
+
+    :param directory: The directory to search
+    :type directory: str
+    :return: A generator of file paths
+    :rtype: generator
+    """
+    if not os.path.isdir(directory):
+        return
+
+    for name in os.listdir(directory):
+        if is_valid_post_file(name):
+            yield os.path.join(directory, name)
+
+
+def cpu_count():
+    """
+    The number of CPUs, or 1 if it can't be determined.
+
+    :rtype: int
+    """
+    try:
+        return os.cpu_count() or 1
+    except AttributeError:
+        # os.cpu_count is new in Python 3.4
+        import multiprocessing
+        return multiprocessing.cpu_count()
+
+
+def hash_bytes(data):
+    """
+    Computes a hex digest for the given bytes.
+
+    :param data: The bytes to hash
+    :type data: bytes
+    :return: The hex digest of the bytes
+    :rtype: str
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, chunk_size=65536):
+    """
+    Computes a hex digest for the contents of the file at the given path.
+
+    :param path: The path of the file to hash
+    :type path: str
+    :param chunk_size: How many bytes to read at a time
+    :type chunk_size: int
+    :return: The hex digest of the file's contents
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _temporary_file(path):
+    """
+    Creates a temporary file next to ``path`` to write its new content into.
+    Unlike ``tempfile.mkstemp``, which always uses mode 0600, the file is
+    created with the permissions a plain ``open()`` would give it: the OS
+    applies the umask, so it never has to be read (or changed) here.
+
+    :param path: The file that will be replaced
+    :type path: str
+    :return: A file descriptor open for writing and the temporary file's path
+    :rtype: tuple
+    """
+    directory = os.path.dirname(path)
+    while True:
+        name = '.{}.tmp'.format(binascii.hexlify(os.urandom(8)).decode('ascii'))
+        tmp_path = os.path.join(directory, name)
+        try:
+            return os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+def write_file(path, content):
+    """
+    Writes content to a file, unless the file already holds exactly that
+    content. The content is written to a temporary file that then replaces
+    the file atomically, so readers never see a partially written file.
+
+    :param path: The file to write
+    :type path: str
+    :param content: The content to write; text is encoded as UTF-8
+    :type content: str or bytes
+    :return: True if the file was written, False if it was already up to date
+    :rtype: bool
+    """
+    data = content.encode('utf-8') if not isinstance(content, bytes) else content
+
+    try:
+        if os.path.getsize(path) == len(data) and hash_file(path) == hash_bytes(data):
+            return False
+    except OSError:
+        pass
+
+    fd, tmp_path = _temporary_file(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+@contextlib.contextmanager
+def open_atomic(path):
+    """
+    Opens a temporary file (in binary mode) to stream the new content of a
+    file into. Once the block finishes, the temporary file atomically
+    replaces the file, unless the file already held exactly that content, in
+    which case it's left untouched like ``write_file`` does.
+
+    :param path: The file to write
+    :type path: str
+    """
+    fd, tmp_path = _temporary_file(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+
+        try:
+            unchanged = (os.path.getsize(path) == os.path.getsize(tmp_path) and
+                         hash_file(path) == hash_file(tmp_path))
+        except OSError:
+            unchanged = False
+
+        if unchanged:
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def gzip_bytes(data, level=9):
+    """
+    Compresses bytes with gzip. The gzip header's timestamp is left empty so
+    that the same data always compresses to the same bytes.
+
+    :param data: The bytes to compress
+    :type data: bytes
+    :param level: The compression level, from 1 to 9
+    :type level: int
+    :rtype: bytes
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(filename='', mode='wb', fileobj=buf, compresslevel=level, mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def reflink(source, dest):
+    """
+    Makes ``dest`` a copy-on-write clone of ``source``, when the platform and
+    filesystem support it.
+
+    :return: True if the clone was made
+    :rtype: bool
+    """
+    if fcntl is None:
+        return False
+
+    try:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except (IOError, OSError):
+        if os.path.exists(dest):
+            os.unlink(dest)
+        return False
+
+    shutil.copystat(source, dest)
+    return True
+
+
+def copy_file(source, dest, link='reflink'):
+    """
+    Copies a file, preserving its mtime.
+
+    :param source: The file to copy
+    :type source: str
+    :param dest: Where to copy it to; any existing file is replaced
+    :type dest: str
+    :param link: ``'hardlink'`` to hardlink the file, ``'reflink'`` to clone
+                 it where the filesystem allows, or ``'copy'`` to always copy
+                 it. Both kinds of link fall back to copying.
+    :type link: str
+    :return: None
+    """
+    dest_dir = os.path.dirname(dest)
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    if os.path.isdir(dest):
+        shutil.rmtree(dest)
+    elif os.path.lexists(dest):
+        os.unlink(dest)
+
+    if link == 'hardlink':
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+    elif link == 'reflink' and reflink(source, dest):
+        return
+
+    shutil.copy2(source, dest)
+
+
+def is_same_file(source, dest, checksum=False):
+    """
+    Determines whether ``dest`` is an up to date copy of ``source``. Files
+    are considered the same when their sizes and mtimes match or, if
+    ``checksum`` is True, when their sizes and contents match.
+
+    :rtype: bool
+    """
+    try:
+        source_stat = os.stat(source)
+        dest_stat = os.stat(dest)
+    except OSError:
+        return False
+
+    if source_stat.st_size != dest_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return checksum and hash_file(source) == hash_file(dest)
+
+
+def sync_tree(source_dir, dest_dir, checksum=False, link='reflink', keep_suffixes=()):
+    """
+    Makes ``dest_dir`` a copy of ``source_dir`` by copying only the files
+    that changed and removing files that no longer exist in ``source_dir``.
+
+    :param source_dir: The directory to copy from
+    :type source_dir: str
+    :param dest_dir: The directory to copy to
+    :type dest_dir: str
+    :param checksum: Compare the contents of files whose mtimes differ
+    :type checksum: bool
+    :param link: How to copy files; see ``copy_file``
+    :type link: str
+    :param keep_suffixes: Suffixes of files in ``dest_dir`` that are kept as
+                          long as the file they're a suffix of is, like the
+                          ``.gz`` siblings of compressed files
+    :type keep_suffixes: tuple
+    :return: The number of files copied and removed
+    :rtype: tuple
+    """
+    copied = removed = 0
+    expected = set()
+
+    for root, _, files in os.walk(source_dir):
+        relroot = os.path.relpath(root, source_dir)
+        expected.add(os.path.normpath(relroot))
+        for name in files:
+            relpath = os.path.normpath(os.path.join(relroot, name))
+            expected.add(relpath)
+            source = os.path.join(source_dir, relpath)
+            dest = os.path.join(dest_dir, relpath)
+            if not is_same_file(source, dest, checksum):
+                copy_file(source, dest, link)
+                copied += 1
+
+    for root, dirs, files in os.walk(dest_dir, topdown=False):
+        relroot = os.path.relpath(root, dest_dir)
+        for name in files:
+            relpath = os.path.normpath(os.path.join(relroot, name))
+            base, suffix = os.path.splitext(relpath)
+            if relpath not in expected and not (suffix in keep_suffixes and base in expected):
+                os.unlink(os.path.join(root, name))
+                removed += 1
+        for name in dirs:
+            path = os.path.join(root, name)
+            if os.path.normpath(os.path.join(relroot, name)) in expected:
+                continue
+            if os.path.islink(path):
+                os.unlink(path)
+            else:
+                shutil.rmtree(path)
+
+    return copied, removed
+
+
+class cached_property(object):
+    """
+    A property that is only computed once per instance, the first time it is
+    accessed. The computed value replaces the property on the instance, so
+    deleting the attribute will cause it to be computed again.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.__name__] = self.func(instance)
+        return value
@@ -0,0 +1,89 @@
+"""
+Polls the source files of a blog for changes.
+"""
+import os
+import time
+
+from nanogen import logger
+
+
+class Watcher(object):
+    """
+    Watches a set of files and directories by periodically comparing the
+    mtime and size of every file beneath them.
+
+    Polling is used rather than inotify (or similar) so that watching works
+    the same everywhere without extra dependencies.
+    """
+
+    def __init__(self, paths, interval=1.0):
+        self.paths = paths
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def __repr__(self):
+        return u'{}(paths={}, interval={})'.format(
+            self.__class__.__name__,
+            self.paths,
+            self.interval
+        )
+
+    def snapshot(self):
+        """
+        Records the mtime and size of every watched file.
+
+        :return: A dictionary of file paths to (mtime, size) tuples
+        :rtype: dict
+        """
+        state = {}
+        for path in self.paths:
+            if os.path.isfile(path):
+                files = [path]
+            else:
+                files = [os.path.join(root, name)
+                         for root, _, names in os.walk(path)
+                         for name in names]
+
+            for file_path in files:
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                state[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def changes(self):
+        """
+        Finds the files that were added, modified or removed since the last
+        time this was called.
+
+        :return: The paths of the changed files
+        :rtype: set
+        """
+        previous, self.state = self.state, self.snapshot()
+        changed = set(path for path in previous if previous[path] != self.state.get(path))
+        changed.update(path for path in self.state if path not in previous)
+        return changed
+
+    def watch(self, callback, should_stop=lambda: False):
+        """
+        Calls ``callback`` with the set of changed paths every time files
+        change, until ``should_stop`` returns True.
+
+        :param callback: A function that takes a set of paths
+        :type callback: callable
+        :param should_stop: A function that returns True when watching should end
+        :type should_stop: callable
+        :return: None
+        """
+        while not should_stop():
+            time.sleep(self.interval)
+            changed = self.changes()
+            if not changed:
+                continue
+
+            logger.log.debug('Detected changes in %s', ', '.join(sorted(changed)))
+            try:
+                callback(changed)
+            except Exception:
+                logger.log.exception('Unable to rebuild after changes')
@@ -0,0 +1,159 @@
+"""
+A background stage that writes generated files, so rendering never waits
+on the filesystem.
+"""
+import os
+import queue
+import threading
+
+from nanogen import logger
+from nanogen import utils
+
+
+class DirectoryCache(object):
+    """
+    Creates directories, remembering which ones exist so that each is only
+    checked (or created) once.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return u'{}(seen={})'.format(self.__class__.__name__, len(self.seen))
+
+    def ensure(self, directory):
+        """
+        Makes sure a directory (and its parents) exists.
+
+        :param directory: The directory to create
+        :type directory: str
+        :return: None
+        """
+        if directory in self.seen:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self.seen.add(directory)
+
+
+class OutputWriter(object):
+    """
+    Writes files from a pool of threads, fed by a bounded queue.
+
+    ``write`` only queues a file, so the caller can go on rendering while
+    earlier files are written. When ``max_pending`` files are waiting, ``write``
+    blocks until the threads catch up, so memory use stays bounded.
+
+    Use it as a context manager; leaving the block waits for every queued
+    file to be written, and raises the first error any thread ran into
+    (unless the block is already raising an error of its own)::
+
+        with OutputWriter() as output:
+            output.write(path, html)
+    """
+    DEFAULT_THREADS = 4
+    DEFAULT_MAX_PENDING = 64
+
+    # Queued to tell a thread to stop
+    _STOP = None
+
+    def __init__(self, threads=DEFAULT_THREADS, max_pending=DEFAULT_MAX_PENDING, directories=None):
+        if max_pending < 1:
+            # A Queue with a maxsize of 0 is unbounded
+            raise ValueError('At least one file must be allowed to wait, got {}'.format(max_pending))
+        self.threads = max(1, threads)
+        self.max_pending = max_pending
+        self.directories = directories or DirectoryCache()
+        self.written = 0
+        self.unchanged = 0
+        self.error = None
+        self._queue = None
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return u'{}(threads={}, max_pending={})'.format(
+            self.__class__.__name__,
+            self.threads,
+            self.max_pending
+        )
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Don't hide the error the block raised behind one of the writer's
+        self.close(raise_error=exc_type is None)
+
+    def start(self):
+        """
+        Starts the writer threads.
+
+        :return: None
+        """
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._workers = [threading.Thread(target=self._run, name='nanogen-writer-{}'.format(i))
+                         for i in range(self.threads)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def write(self, path, content):
+        """
+        Queues a file to be written with ``nanogen.utils.write_file``.
+
+        :param path: The file to write
+        :type path: str
+        :param content: The content to write
+        :type content: str or bytes
+        :return: None
+        """
+        if self.error is not None:
+            raise self.error
+        self._queue.put((path, content))
+
+    def close(self, raise_error=True):
+        """
+        Waits for every queued file to be written and stops the threads.
+
+        :param raise_error: Raise the first error a thread ran into while
+                            writing, if there was one
+        :type raise_error: bool
+        :return: None
+        """
+        for _ in self._workers:
+            self._queue.put(self._STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+        logger.log.debug('Wrote %d files, %d were unchanged', self.written, self.unchanged)
+        if raise_error and self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if self.error is not None:
+                # Keep draining the queue so producers don't block forever
+                continue
+
+            path, content = item
+            try:
+                self.directories.ensure(os.path.dirname(path))
+                written = utils.write_file(path, content)
+            except Exception as e:
+                logger.log.debug('Failed to write %s: %s', path, e)
+                self.error = e
+                continue
+
+            with self._lock:
+                if written:
+                    self.written += 1
+                else:
+                    self.unchanged += 1
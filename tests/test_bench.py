@@ -0,0 +1,75 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from nanogen import bench
+from nanogen import cli
+from nanogen import models
+
+
+def test_generate_corpus(tmpdir):
+    directory = str(tmpdir.join('blog'))
+    bench.generate_corpus(directory, 8, seed=1)
+
+    blog = models.Blog(directory)
+    assert len(blog.posts) == 8
+    assert blog.config['site']['title'] == 'Benchmark blog'
+
+    # The same seed generates the same posts
+    other = str(tmpdir.join('other'))
+    bench.generate_corpus(other, 8, seed=1)
+    for name in os.listdir(os.path.join(directory, '_posts')):
+        with open(os.path.join(directory, '_posts', name)) as a, \
+                open(os.path.join(other, '_posts', name)) as b:
+            assert a.read() == b.read()
+
+
+def test_run(tmpdir):
+    directory = str(tmpdir.join('blog'))
+    bench.generate_corpus(directory, 4)
+
+    results = bench.run(directory)
+    for run_name in ('cold', 'warm'):
+        for step in bench.STEPS + ('total',):
+            assert results[run_name][step] >= 0
+        # Each build runs in a process of its own
+        assert results[run_name]['peak_memory'] > 0
+    assert 'generate_posts' in bench.report(results, 4)
+
+
+def test_run_refuses_other_blogs(tmpdir):
+    directory = str(tmpdir.join('blog'))
+    os.makedirs(directory)
+    models.Blog(directory).init()
+    tmpdir.join('blog', '_site', 'index.html').write('keep me', ensure=True)
+
+    with pytest.raises(ValueError):
+        bench.run(directory)
+    assert tmpdir.join('blog', '_site', 'index.html').read() == 'keep me'
+
+
+def test_bench_refuses_other_blogs(tmpdir):
+    tmpdir.join('blog', '_posts', '2000-01-01-post.md').write('# Post', ensure=True)
+    tmpdir.join('blog', '_site', 'index.html').write('keep me', ensure=True)
+
+    with tmpdir.as_cwd():
+        result = CliRunner().invoke(cli.cli, ['bench', '--directory', str(tmpdir.join('blog'))])
+    assert result.exit_code == 2
+    assert 'was not created by nanogen bench' in result.output
+    assert tmpdir.join('blog', '_site', 'index.html').read() == 'keep me'
+
+
+def test_compare():
+    baseline = {'cold': {'generate_posts': 1.0, 'total': 2.0}}
+    results = {'cold': {'generate_posts': 1.5, 'total': 2.001}}
+
+    assert bench.compare(results, baseline) == [('cold', 'generate_posts', 1.0, 1.5)]
+    assert bench.compare(results, baseline, threshold=0.6) == []
+
+
+def test_bench_rejects_unknown_size(tmpdir):
+    with tmpdir.as_cwd():
+        result = CliRunner().invoke(cli.cli, ['bench', '--size', 'huge'])
+    assert result.exit_code == 2
+    assert 'must be a number of posts or one of: small, medium, large' in result.output
@@ -0,0 +1,82 @@
+import os
+import time
+
+from unittest import mock
+
+import jinja2
+
+from nanogen import cache
+
+
+def test_render_cache_hit(tmpdir):
+    render_cache = cache.RenderCache(str(tmpdir.join('html')))
+
+    with mock.patch('nanogen.renderer.markdown', return_value='<p>html</p>') as md:
+        assert render_cache.render('Some *text*') == '<p>html</p>'
+        assert render_cache.render('Some *text*') == '<p>html</p>'
+        assert md.call_count == 1
+
+        render_cache.render('Other text')
+        assert md.call_count == 2
+
+    stats = render_cache.stats()
+    assert stats['entries'] == 2
+    assert stats['size'] == 2 * len('<p>html</p>')
+
+
+def test_render_cache_key_depends_on_versions(tmpdir):
+    render_cache = cache.RenderCache(str(tmpdir.join('html')))
+    key = render_cache.key('text')
+
+    with mock.patch('nanogen.renderer.version_string', return_value='other'):
+        assert render_cache.key('text') != key
+
+
+def test_render_cache_evicts_least_recently_used(tmpdir):
+    render_cache = cache.RenderCache(str(tmpdir.join('html')), max_size=25)
+
+    render_cache.set('aa1', 'x' * 10)
+    render_cache.set('bb2', 'x' * 10)
+    past = time.time() - 60
+    os.utime(render_cache.entry_path('aa1'), (past, past))
+    os.utime(render_cache.entry_path('bb2'), (past + 1, past + 1))
+
+    # Reading an entry makes it the most recently used one
+    assert render_cache.get('aa1') == 'x' * 10
+    render_cache.set('cc3', 'x' * 10)
+
+    assert render_cache.get('aa1') is not None
+    assert render_cache.get('bb2') is None
+    assert render_cache.get('cc3') is not None
+
+
+def test_render_cache_clear(tmpdir):
+    render_cache = cache.RenderCache(str(tmpdir.join('html')))
+    render_cache.set('aa1', 'html')
+    assert render_cache.clear() == 1
+    assert render_cache.stats()['entries'] == 0
+
+
+def test_template_bytecode_cache(tmpdir):
+    layout = tmpdir.mkdir('layout')
+    template_file = layout.join('page.html')
+    template_file.write('Hello {{ name }}')
+    cache_dir = tmpdir.join('templates')
+
+    def render():
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader(str(layout)),
+                                 bytecode_cache=cache.TemplateBytecodeCache(str(cache_dir)))
+        return env.get_template('page.html').render(name='world')
+
+    assert render() == 'Hello world'
+    assert len(cache_dir.listdir()) == 1
+
+    # A fresh environment uses the cached bytecode instead of compiling
+    with mock.patch.object(jinja2.Environment, 'compile') as compile_template:
+        assert render() == 'Hello world'
+        assert not compile_template.called
+
+    # Changing the template's source invalidates its entry
+    template_file.write('Goodbye {{ name }}')
+    assert render() == 'Goodbye world'
+    assert len(cache_dir.listdir()) == 1
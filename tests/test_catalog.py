@@ -0,0 +1,115 @@
+import os
+
+from unittest import mock
+
+from click.testing import CliRunner
+
+from nanogen import catalog
+from nanogen import cli
+from nanogen import models
+
+
+def make_catalog(tmpdir):
+    posts_dir = tmpdir.mkdir('_posts')
+    posts_dir.join('2018-01-01-first.md').write('# First\ntags: a, b\n\nOne.\n')
+    posts_dir.join('2018-02-01-second.md').write('# Second\n\nTwo.\n')
+    return catalog.Catalog(str(tmpdir.join('.nanogen')), models.PostMeta), posts_dir
+
+
+def test_catalog_refresh(tmpdir):
+    post_catalog, posts_dir = make_catalog(tmpdir)
+    assert post_catalog.refresh([str(posts_dir)]) == (2, 0)
+
+    metas = list(post_catalog.metas('/site', [str(posts_dir)]))
+    path = str(posts_dir.join('2018-01-01-first.md'))
+    assert metas[0] == models.PostMeta.from_file('/site', path)
+    assert metas[0].tags == ('a', 'b')
+    assert [meta.title for meta in metas] == ['First', 'Second']
+
+    # Unchanged files aren't read again
+    with mock.patch.object(models.PostMeta, 'from_file') as from_file:
+        assert post_catalog.refresh([str(posts_dir)]) == (0, 0)
+        os.utime(path, (1, 1))
+        assert post_catalog.refresh([str(posts_dir)]) == (0, 0)
+        assert not from_file.called
+
+    posts_dir.join('2018-01-01-first.md').write('# First, edited\n\nOne.\n')
+    posts_dir.join('2018-02-01-second.md').remove()
+    assert post_catalog.refresh([str(posts_dir)]) == (1, 1)
+    assert [meta.title for meta in post_catalog.metas('/site', [str(posts_dir)])] == ['First, edited']
+
+
+def test_catalog_metas_query(tmpdir):
+    post_catalog, posts_dir = make_catalog(tmpdir)
+    drafts_dir = tmpdir.mkdir('_drafts')
+    drafts_dir.join('2018-03-01-draft.md').write('# Draft\n\nThree.\n')
+    post_catalog.refresh([str(posts_dir), str(drafts_dir)])
+
+    everything = post_catalog.metas('/site', [str(posts_dir), str(drafts_dir)])
+    assert [meta.slug for meta in everything] == ['first', 'second', 'draft']
+
+    # Refreshing only the posts leaves the drafts alone
+    assert post_catalog.refresh([str(posts_dir)]) == (0, 0)
+    assert len(list(post_catalog.metas('/site', [str(drafts_dir)]))) == 1
+
+
+def test_catalog_html(tmpdir):
+    post_catalog, posts_dir = make_catalog(tmpdir)
+    post_catalog.refresh([str(posts_dir)])
+    path = str(posts_dir.join('2018-01-01-first.md'))
+
+    assert post_catalog.get_html(path, 'v1') is None
+    post_catalog.set_html(path, 'v1', '<p>One.</p>')
+    assert post_catalog.get_html(path, 'v1') == '<p>One.</p>'
+    assert post_catalog.get_html(path, 'v2') is None
+
+    # Changing the post forgets its HTML
+    posts_dir.join('2018-01-01-first.md').write('# First\n\nChanged.\n')
+    post_catalog.refresh([str(posts_dir)])
+    assert post_catalog.get_html(path, 'v1') is None
+
+    post_catalog.clear()
+    assert not os.path.exists(post_catalog.path)
+
+
+def test_blog_with_catalog(tmpdir):
+    _, posts_dir = make_catalog(tmpdir)
+    tmpdir.join('blog.cfg').write('[catalog]\nenabled = yes\n')
+
+    blog = models.Blog(str(tmpdir))
+    assert [post.title for post in blog.posts] == ['First', 'Second']
+    assert blog.posts[0].html_content == '<p>One.</p>\n'
+
+    # A new Blog gets its posts and their HTML without reading post files
+    blog = models.Blog(str(tmpdir))
+    with mock.patch('nanogen.models.read_header') as read_header, \
+            mock.patch('nanogen.renderer.markdown') as markdown:
+        assert [post.slug for post in blog.posts] == ['first', 'second']
+        assert blog.posts[0].html_content == '<p>One.</p>\n'
+        assert not read_header.called and not markdown.called
+
+
+def test_blog_rebuild_enables_catalog(tmpdir):
+    make_catalog(tmpdir)
+    models.Blog(str(tmpdir)).init()
+    config = tmpdir.join('blog.cfg')
+
+    blog = models.Blog(str(tmpdir))
+    assert blog.catalog is None
+
+    config.write(config.read() + '\n[catalog]\nenabled = yes\n')
+    blog.rebuild([str(config)])
+    assert blog.catalog is not None
+    assert os.path.isfile(blog.catalog.path)
+
+
+def test_cache_clear_removes_catalog_without_render_cache(tmpdir):
+    post_catalog, _ = make_catalog(tmpdir)
+    tmpdir.join('blog.cfg').write('[cache]\nenabled = no\n\n[catalog]\nenabled = yes\n')
+    post_catalog.refresh([str(tmpdir.join('_posts'))])
+    post_catalog.close()
+
+    with tmpdir.as_cwd():
+        result = CliRunner().invoke(cli.cli, ['cache', 'clear'])
+    assert result.exit_code == 0
+    assert not os.path.isfile(post_catalog.path)
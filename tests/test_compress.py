@@ -0,0 +1,150 @@
+import gzip
+import os
+
+from unittest import mock
+
+import pytest
+
+from nanogen import compress
+from nanogen import models
+
+
+config = """\
+[site]
+title = Test
+author = Test
+email = test@example.com
+url = http://www.example.com
+description = Test
+
+[compress]
+enabled = yes
+min_size = 0
+formats = gzip
+"""
+
+
+def test_is_compressible(tmpdir):
+    big = tmpdir.join('page.html')
+    big.write('x' * 2048)
+    tmpdir.join('small.html').write('x')
+    tmpdir.join('image.png').write('x' * 2048)
+    tmpdir.join('.hidden.json').write('x' * 2048)
+
+    assert compress.is_compressible(str(big))
+    assert not compress.is_compressible(str(tmpdir.join('small.html')))
+    assert compress.is_compressible(str(tmpdir.join('small.html')), min_size=0)
+    assert not compress.is_compressible(str(tmpdir.join('image.png')))
+    assert not compress.is_compressible(str(tmpdir.join('.hidden.json')))
+    assert not compress.is_compressible(str(tmpdir.join('missing.html')))
+
+
+def test_available_formats():
+    with mock.patch.object(compress, 'brotli', None):
+        assert compress.available_formats(('gzip', 'brotli')) == ('gzip',)
+    with pytest.raises(ValueError):
+        compress.available_formats(('zip',))
+
+
+def test_compress_file_skips_unchanged(tmpdir):
+    page = tmpdir.join('page.html')
+    page.write('<p>hello</p>' * 200)
+
+    assert compress.compress_file(str(page)) == 1
+    sibling = tmpdir.join('page.html.gz')
+    assert gzip.decompress(sibling.read_binary()) == page.read_binary()
+    assert os.stat(str(sibling)).st_mtime_ns == os.stat(str(page)).st_mtime_ns
+
+    assert compress.compress_file(str(page)) == 0
+
+    page.write('<p>goodbye</p>' * 200)
+    os.utime(str(page), (1, 1))
+    assert compress.compress_file(str(page)) == 1
+    assert gzip.decompress(sibling.read_binary()) == page.read_binary()
+
+
+def test_compress_tree(tmpdir):
+    site = tmpdir.mkdir('site')
+    site.join('index.html').write('<p>index</p>' * 200)
+    site.mkdir('2018').join('post.html').write('<p>post</p>' * 200)
+    site.join('tiny.html').write('<p></p>')
+    site.mkdir('search').join('shard.json.gz').write('already compressed')
+
+    written, removed = compress.compress_tree(str(site), exclude=[str(site.join('search'))])
+    assert (written, removed) == (2, 0)
+    assert site.join('2018').join('post.html.gz').check()
+    assert not site.join('tiny.html.gz').check()
+    assert site.join('search').join('shard.json.gz').check()
+
+    # Compressed files compress_tree didn't write are left alone
+    assert compress.compress_tree(str(site)) == (0, 0)
+    assert site.join('search').join('shard.json.gz').check()
+
+    site.join('2018').join('post.html').remove()
+    site.join('index.html').write('<p></p>')
+    assert compress.compress_tree(str(site)) == (0, 2)
+    assert sorted(site.listdir()) == [site.join(compress.RECORD_FILENAME), site.join('2018'),
+                                      site.join('index.html'), site.join('search'),
+                                      site.join('tiny.html')]
+
+
+def test_blog_build_compressed(tmpdir):
+    tmpdir.join('blog.cfg').write(config)
+    tmpdir.mkdir('_layout').join('post.html').write('{{ post.html_content }}')
+    tmpdir.join('_layout').join('index.html').write('index')
+    tmpdir.join('_layout').join('rss.xml').write('rss')
+    tmpdir.join('_layout').join('feed.json').write('{}')
+    tmpdir.join('_layout').mkdir('static').join('site.css').write('body {}')
+    tmpdir.mkdir('_posts').join('2018-01-01-post.md').write('# Post\n\nContent.\n')
+
+    blog = models.Blog(str(tmpdir))
+    blog.build()
+
+    site = tmpdir.join('_site')
+    for path in ('index.html', 'rss.xml', 'feed.json', '2018/01/post.html', 'static/site.css'):
+        assert gzip.decompress(site.join(path + '.gz').read_binary()) == site.join(path).read_binary()
+    assert not site.join(models.manifest.Manifest.FILENAME + '.gz').check()
+
+    # Rebuilding leaves the compressed static files alone
+    blog.build()
+    assert site.join('static').join('site.css.gz').check()
+
+
+def test_blog_build_uncompressed_removes_siblings(tmpdir):
+    tmpdir.join('blog.cfg').write(config.replace('enabled = yes', 'enabled = no'))
+    tmpdir.mkdir('_layout').join('post.html').write('{{ post.html_content }}')
+    tmpdir.join('_layout').join('index.html').write('index')
+    tmpdir.join('_layout').mkdir('static').join('app.js.gz').write_binary(gzip.compress(b'app'))
+    tmpdir.mkdir('_posts').join('2018-01-01-post.md').write('# Post\n\nContent.\n')
+
+    blog = models.Blog(str(tmpdir))
+    blog.build(compress_output=True)
+    site = tmpdir.join('_site')
+    assert site.join('2018').join('01').join('post.html.gz').check()
+
+    # A stale compressed copy of the edited post would otherwise be served
+    tmpdir.join('_posts').join('2018-01-01-post.md').write('# Post\n\nEdited.\n')
+    blog = models.Blog(str(tmpdir))
+    blog.build()
+    assert not site.join('2018').join('01').join('post.html.gz').check()
+    assert not site.join(compress.RECORD_FILENAME).check()
+    assert site.join('static').join('app.js.gz').check()
+
+
+def test_blog_build_keeps_compressed_static_files(tmpdir):
+    tmpdir.join('blog.cfg').write(config)
+    tmpdir.mkdir('_layout').join('post.html').write('{{ post.html_content }}')
+    tmpdir.join('_layout').join('index.html').write('index')
+    static = tmpdir.join('_layout').mkdir('static')
+    static.mkdir('dl').join('data.tar.gz').write_binary(gzip.compress(b'data'))
+    static.join('app.js.gz').write_binary(gzip.compress(b'app'))
+    tmpdir.mkdir('_posts')
+
+    blog = models.Blog(str(tmpdir))
+    blog.build()
+    blog.build()
+
+    site_static = tmpdir.join('_site').join('static')
+    assert site_static.join('dl').join('data.tar.gz').read_binary() == \
+        static.join('dl').join('data.tar.gz').read_binary()
+    assert site_static.join('app.js.gz').check()
@@ -0,0 +1,140 @@
+import json
+import os
+
+from unittest import mock
+from xml.etree import ElementTree
+
+import pytest
+
+from nanogen import feeds
+from nanogen import models
+
+
+SITE = {
+    'title': 'Test & Co',
+    'url': 'http://www.example.com',
+    'description': 'A <test> blog',
+    'author': 'Example user',
+    'email': 'user@example.com',
+}
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def make_posts(tmpdir):
+    posts_dir = tmpdir.mkdir('_posts')
+    posts_dir.join('2018-01-01-first.md').write('# First & best\n\nOne <b>bold</b> & more.\n\nTwo.\n')
+    posts_dir.join('2018-01-02-second.md').write('# Second\nsummary: The "second" post\n\nThree.\n')
+    return [models.Post('/site', str(posts_dir.join(name)))
+            for name in ('2018-01-02-second.md', '2018-01-01-first.md')]
+
+
+def test_summary_html(tmpdir):
+    second, first = make_posts(tmpdir)
+    assert feeds.summary_html(second) == '<p>The "second" post</p>'
+    assert feeds.summary_html(first) == '<p>One <b>bold</b> &amp; more.</p>'
+
+
+def test_rss_writer(tmpdir):
+    posts = make_posts(tmpdir)
+    path = tmpdir.join('rss.xml')
+    feeds.RSSWriter(SITE).write(str(path), posts, 'rss.xml')
+
+    channel = ElementTree.parse(str(path)).getroot().find('channel')
+    assert channel.find('title').text == 'Test & Co'
+    items = channel.findall('item')
+    assert [item.find('title').text for item in items] == ['Second', 'First & best']
+    assert items[0].find('link').text == 'http://www.example.com/2018/01/second.html'
+    assert items[0].find('pubDate').text == 'Tue, 02 Jan 2018 00:00:00 -0000'
+    assert items[1].find('description').text == posts[1].html_content
+
+
+def test_atom_writer_summary(tmpdir):
+    posts = make_posts(tmpdir)
+    path = tmpdir.join('atom.xml')
+    feeds.AtomWriter(SITE, limit=1, content='summary').write(str(path), posts, 'tag/x/atom.xml', 'x')
+
+    root = ElementTree.parse(str(path)).getroot()
+    assert root.find(ATOM + 'title').text == 'Test & Co: x'
+    assert root.find(ATOM + 'id').text == 'http://www.example.com/tag/x/atom.xml'
+    assert root.find(ATOM + 'updated').text == '2018-01-02T00:00:00Z'
+    entries = root.findall(ATOM + 'entry')
+    assert len(entries) == 1
+    assert entries[0].find(ATOM + 'summary').text == '<p>The "second" post</p>'
+
+
+def test_json_feed_writer(tmpdir):
+    posts = make_posts(tmpdir)
+    path = tmpdir.join('feed.json')
+    feeds.JSONFeedWriter(SITE, limit=0).write(str(path), posts, 'feed.json')
+
+    feed = json.loads(path.read())
+    assert feed['title'] == 'Test & Co'
+    assert feed['feed_url'] == 'http://www.example.com/feed.json'
+    assert [item['title'] for item in feed['items']] == ['Second', 'First & best']
+    assert feed['items'][1]['content_html'] == posts[1].html_content
+
+    feeds.JSONFeedWriter(SITE).write(str(path), [], 'feed.json')
+    assert json.loads(path.read())['items'] == []
+
+
+def test_feed_writer_caches_items(tmpdir):
+    posts = make_posts(tmpdir)
+    writer = feeds.RSSWriter(SITE)
+    writer.write(str(tmpdir.join('rss.xml')), posts, 'rss.xml')
+    mtime = os.stat(str(tmpdir.join('rss.xml'))).st_mtime_ns
+
+    with mock.patch.object(feeds.RSSWriter, 'item') as item:
+        writer.write(str(tmpdir.join('other.xml')), posts[1:], 'other.xml')
+        writer.write(str(tmpdir.join('rss.xml')), posts, 'rss.xml')
+        assert not item.called
+
+    # An unchanged feed isn't rewritten
+    assert os.stat(str(tmpdir.join('rss.xml'))).st_mtime_ns == mtime
+
+    writer.clear_items()
+    writer.write(str(tmpdir.join('rss.xml')), posts, 'rss.xml', cache=False)
+    assert not writer.items
+
+
+def test_create_writers():
+    writers = feeds.create_writers(SITE, formats=('atom', 'json'), content='summary')
+    assert [writer.FILENAME for writer in writers] == ['atom.xml', 'feed.json']
+    with pytest.raises(ValueError):
+        feeds.create_writers(SITE, formats=('csv',))
+    with pytest.raises(ValueError):
+        feeds.create_writers(SITE, content='excerpt')
+    with pytest.raises(TypeError):
+        feeds.FeedWriter(SITE)
+
+
+def test_blog_native_feeds(tmpdir):
+    make_posts(tmpdir)
+    tmpdir.join('blog.cfg').write(
+        '[site]\ntitle = Test\nurl = http://www.example.com\ndescription = Test\n'
+        'author = Example user\nemail = user@example.com\n\n'
+        '[feeds]\nnative = yes\nformats = rss, atom\n')
+    tmpdir.mkdir('_layout').join('rss.xml').write('not used')
+    tmpdir.mkdir('_site')
+    tmpdir.join('_posts').join('2018-01-03-third.md').write('# Third\ntags: python\n\nFour.\n')
+
+    blog = models.Blog(str(tmpdir))
+    blog.generate_feeds()
+    blog.generate_taxonomies()
+
+    site = tmpdir.join('_site')
+    rss = ElementTree.parse(str(site.join('rss.xml'))).getroot()
+    assert len(rss.find('channel').findall('item')) == 3
+    assert site.join('atom.xml').check()
+    assert not site.join('feed.json').check()
+
+    tag_feed = ElementTree.parse(str(site.join('tag').join('python').join('atom.xml'))).getroot()
+    assert tag_feed.find(ATOM + 'title').text == 'Test: python'
+
+    # Each post's item was encoded once for the site and tag feeds, and the
+    # cached items are dropped once the build's last feed is written
+    assert all(not feed_writer.items for feed_writer in blog.feed_writers)
+    with mock.patch.object(feeds.RSSWriter, 'item', return_value=u'<item/>') as item:
+        blog.generate_feeds()
+        blog.generate_taxonomies()
+        assert item.call_count == 3
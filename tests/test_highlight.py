@@ -0,0 +1,66 @@
+from unittest import mock
+
+import pygments
+
+from nanogen import highlight
+from nanogen import models
+from nanogen import renderer
+
+
+CODE = 'def greet(name):\n    return name\n'
+
+
+def test_highlighter_reuses_lexers_and_formatters():
+    highlighter = highlight.Highlighter()
+    assert highlighter.lexer('python') is highlighter.lexer('python')
+    assert highlighter.lexer('no-such-language') is None
+    assert highlighter.formatter() is highlighter.formatter()
+
+
+def test_highlighter_memoizes_output():
+    highlighter = highlight.Highlighter(max_entries=2)
+    html = highlighter.highlight(CODE, 'python')
+    assert html.startswith('<div class="highlight"><pre>')
+
+    with mock.patch.object(pygments, 'highlight') as pygments_highlight:
+        assert highlighter.highlight(CODE, 'python') == html
+        assert not pygments_highlight.called
+
+    # The least recently used block is forgotten
+    highlighter.highlight('x = 1\n', 'python')
+    highlighter.highlight(CODE, 'python')
+    highlighter.highlight('y = 2\n', 'python')
+    assert list(highlighter.entries) == [highlighter.key(CODE, 'python'), highlighter.key('y = 2\n', 'python')]
+
+    assert highlighter.highlight(CODE, 'no-such-language') is None
+
+
+def test_highlighter_disk_cache(tmpdir):
+    html = highlight.Highlighter(cache_dir=str(tmpdir)).highlight(CODE, 'python')
+
+    with mock.patch.object(pygments, 'highlight') as pygments_highlight:
+        assert highlight.Highlighter(cache_dir=str(tmpdir)).highlight(CODE, 'python') == html
+        assert not pygments_highlight.called
+
+
+def test_renderer_block_code():
+    html = renderer.markdown('```python\n{}```\n\n```nope\na < b\n```\n\n```\n<plain>\n```\n'.format(CODE))
+    assert '<span class="k">def</span>' in html
+    assert '<pre class="nope"><code>a &lt; b</code></pre>' in html
+    assert '<pre><code>&lt;plain&gt;</code></pre>' in html
+
+
+def test_blog_highlight_css(tmpdir):
+    tmpdir.join('blog.cfg').write('[highlight]\ncss = yes\nstyle = monokai\n')
+    tmpdir.mkdir('_site')
+
+    blog = models.Blog(str(tmpdir))
+    assert highlight.highlighter.cache_dir == str(tmpdir.join('.nanogen').join('highlight'))
+    blog.generate_highlight_css()
+    assert tmpdir.join('_site').join('pygments.css').read() == highlight.css('monokai')
+
+    tmpdir.join('blog.cfg').write('[cache]\nenabled = no\n')
+    blog = models.Blog(str(tmpdir))
+    assert highlight.highlighter.cache_dir is None
+    blog.generate_highlight_css()
+    assert not tmpdir.join('_site').join('pygments.css').check()
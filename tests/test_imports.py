@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+
+# Generous, so that slow CI machines don't fail; a command that imports the
+# rendering stack takes several times longer than this
+IMPORT_BUDGET_MS = 500
+
+HEAVY_MODULES = ('jinja2', 'mistune', 'pygments')
+
+# Imports a module and prints how long it took, in milliseconds, followed by
+# the names of every module that's been imported
+SCRIPT = """\
+import sys, time
+start = time.time()
+import {module}
+print((time.time() - start) * 1000)
+print('\\n'.join(sys.modules))
+"""
+
+
+def import_module(module):
+    """
+    Imports a module in a new interpreter.
+
+    :return: How long the import took, in milliseconds, and the names of the
+             modules it imported
+    :rtype: tuple
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT.format(module=module)],
+                                     cwd=root, universal_newlines=True)
+    lines = output.splitlines()
+    return float(lines[0]), set(lines[1:])
+
+
+def test_cli_does_not_import_rendering_stack():
+    elapsed, modules = import_module('nanogen.cli')
+    assert not [name for name in modules if name.split('.')[0] in HEAVY_MODULES]
+    assert 'nanogen.feeds' not in modules
+    assert 'nanogen.catalog' not in modules and 'sqlite3' not in modules
+    assert elapsed < IMPORT_BUDGET_MS
+
+
+def test_rendering_imports_rendering_stack():
+    # Makes sure import_module sees imports at all, so the test above can't
+    # pass because nothing was recorded
+    _, modules = import_module('nanogen.renderer')
+    assert 'mistune' in modules and 'pygments' in modules
@@ -0,0 +1,70 @@
+import os
+
+from nanogen import manifest
+from nanogen import models
+
+
+example_post = """\
+# Test Post
+
+Some _markdown_ content.
+"""
+
+
+def make_post(tmpdir, output_dir):
+    posts_dir = tmpdir.join('_posts')
+    if not posts_dir.check():
+        posts_dir.mkdir()
+    f = posts_dir.join('2018-01-01-test-post.md')
+    f.write(example_post)
+    return models.Post(output_dir, str(f))
+
+
+def test_manifest_round_trip(tmpdir):
+    output_dir = str(tmpdir.join('_site'))
+    post = make_post(tmpdir, output_dir)
+
+    m = manifest.Manifest(output_dir, str(tmpdir))
+    assert not m.is_current(post)
+
+    os.makedirs(os.path.dirname(post.permapath))
+    with open(post.permapath, 'w') as f:
+        f.write('rendered')
+    m.record(post)
+    m.save()
+
+    reloaded = manifest.Manifest(output_dir, str(tmpdir))
+    assert reloaded.is_current(post)
+
+
+def test_manifest_detects_changes(tmpdir):
+    output_dir = str(tmpdir.join('_site'))
+    post = make_post(tmpdir, output_dir)
+    os.makedirs(os.path.dirname(post.permapath))
+    with open(post.permapath, 'w') as f:
+        f.write('rendered')
+
+    m = manifest.Manifest(output_dir, str(tmpdir))
+    m.check_inputs(templates='a', config='b')
+    m.record(post)
+    assert m.is_current(post)
+
+    with open(post.path, 'a') as f:
+        f.write('More content.\n')
+    assert not m.is_current(post)
+
+    m.record(post)
+    assert m.check_inputs(templates='a', config='b')
+    assert not m.check_inputs(templates='c', config='b')
+    assert not m.is_current(post)
+
+
+def test_manifest_prune(tmpdir):
+    output_dir = str(tmpdir.join('_site'))
+    post = make_post(tmpdir, output_dir)
+
+    m = manifest.Manifest(output_dir, str(tmpdir))
+    m.record(post)
+    assert m.prune([post]) == []
+    assert m.prune([]) == [post.permapath]
+    assert m.posts == {}
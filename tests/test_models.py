@@ -4,7 +4,9 @@ from unittest import mock
 
 import pytest
 
+from nanogen import highlight
 from nanogen import models
+from nanogen import profiler
 
 
 example_post = """\
@@ -364,3 +366,527 @@ def test_publish_raises_value_error(tmpdir):
     drafts = [os.path.basename(str(file)) for file in drafts_dir.listdir()]
     assert len(posts) == 0
     assert expected_filename in drafts
+
+
+def test_blog_generate_posts_incremental(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.mkdir('_site')
+
+    blog = models.Blog(str(path))
+    blog.init()
+
+    with mock.patch('subprocess.call'):
+        blog.new_post('Test title 1', draft=False)
+        blog.new_post('Test title 2', draft=False)
+
+    blog = models.Blog(str(path))
+    blog.generate_posts()
+
+    today = datetime.date.today()
+    post_dir = site_path.join('{}'.format(today.year)).join('{:02d}'.format(today.month))
+    first_output = post_dir.join('test-title-1.html')
+    second_output = post_dir.join('test-title-2.html')
+    first_output.write('untouched')
+
+    # Only the edited post should be rendered again
+    second_source = path.join('_posts').join('{}-{:02d}-{:02d}-test-title-2.md'.format(
+        today.year,
+        today.month,
+        today.day
+    ))
+    second_source.write('# Edited\n\nNew body.\n')
+    blog = models.Blog(str(path))
+    blog.generate_posts()
+    assert first_output.read() == 'untouched'
+    assert 'Edited' in second_output.read()
+
+    # Removing a post removes its output
+    second_source.remove()
+    blog = models.Blog(str(path))
+    blog.generate_posts()
+    assert first_output.check()
+    assert not second_output.check()
+
+    # Changing a template renders everything again
+    path.join('_layout').join('post.html').write('{{ post.title }} v2')
+    blog = models.Blog(str(path))
+    blog.generate_posts()
+    assert first_output.read() == 'Test title 1 v2'
+
+    # So does upgrading the renderer
+    first_output.write('untouched')
+    with mock.patch('nanogen.renderer.RENDERER_VERSION', -1):
+        blog = models.Blog(str(path))
+        blog.generate_posts()
+    assert first_output.read() == 'Test title 1 v2'
+
+
+def test_post_renders_lazily(tmpdir):
+    f = tmpdir.mkdir('blog').join('2018-01-01-test-post.md')
+    f.write(example_post)
+
+    with mock.patch('nanogen.renderer.markdown', return_value='<p>html</p>') as md:
+        p = models.Post(str(tmpdir), str(f))
+        assert p.title == 'Test Post'
+        assert 'raw_content' not in p.__dict__
+        assert not md.called
+
+        assert p.html_content == '<p>html</p>'
+        assert p.html_content == '<p>html</p>'
+        assert md.call_count == 1
+
+
+def test_blog_collects_posts_lazily(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    with mock.patch('subprocess.call'):
+        blog.new_post('Test title', draft=False)
+
+    with mock.patch.object(models.Blog, 'iter_posts', return_value=iter([])) as collect:
+        blog = models.Blog(str(path))
+        assert not collect.called
+        assert len(blog.posts) == 0
+        assert len(blog.posts) == 0
+        assert collect.call_count == 1
+
+
+def test_blog_generate_posts_in_parallel(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    posts_dir = path.join('_posts')
+    for day in range(1, 6):
+        posts_dir.join('2018-01-{:02d}-post-{}.md'.format(day, day)).write(
+            '# Post {}\n\nSome `code` and _text_.\n'.format(day))
+
+    serial = models.Blog(str(path))
+    serial.output_dir = str(path.join('_serial'))
+    serial.generate_posts()
+
+    parallel = models.Blog(str(path))
+    parallel.generate_posts(jobs=2)
+
+    for day in range(1, 6):
+        relpath = os.path.join('2018', '01', 'post-{}.html'.format(day))
+        with open(os.path.join(serial.output_dir, relpath), 'rb') as f:
+            expected = f.read()
+        with open(os.path.join(parallel.output_dir, relpath), 'rb') as f:
+            assert f.read() == expected
+
+
+def test_blog_rebuild(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.join('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    posts_dir = path.join('_posts')
+    posts_dir.join('2018-01-01-first.md').write('# First\n\nFirst post.\n')
+    blog = models.Blog(str(path))
+    blog.build()
+
+    index = site_path.join('index.html')
+    post = site_path.join('2018').join('01').join('first.html')
+    rss = site_path.join('rss.xml')
+
+    # A changed template only re-renders the pages that use it
+    index.write('stale index')
+    rss.write('stale rss')
+    post.write('stale post')
+    index_template = path.join('_layout').join('index.html')
+    index_template.write('{% for post in posts %}{{ post.title }} {% endfor %}')
+    blog.rebuild([str(index_template)])
+    assert index.read() == 'First '
+    assert rss.read() == 'stale rss'
+    assert post.read() == 'stale post'
+
+    # A new post renders that post, the index and the feeds
+    new_post = posts_dir.join('2018-01-02-second.md')
+    new_post.write('# Second\n\nSecond post.\n')
+    blog.rebuild([str(new_post)])
+    assert site_path.join('2018').join('01').join('second.html').check()
+    assert index.read() == 'Second First '
+    assert 'Second' in rss.read()
+    assert post.read() == 'stale post'
+
+    # A static file is copied on its own
+    static_file = path.join('_layout').join('static').join('extra.css')
+    static_file.write('body {}')
+    blog.rebuild([str(static_file)])
+    assert site_path.join('static').join('extra.css').read() == 'body {}'
+
+    static_file.remove()
+    blog.rebuild([str(static_file)])
+    assert not site_path.join('static').join('extra.css').check()
+
+
+def test_blog_rebuild_config(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+    blog = models.Blog(str(path))
+    assert blog.render_cache is not None
+    assert highlight.highlighter.cache_dir is not None
+
+    config = path.join('blog.cfg')
+    config.write(example_config + '\n[cache]\nenabled = no\n\n[highlight]\nmemory_entries = 7\n')
+    blog.rebuild([str(config)])
+    assert blog.render_cache is None
+    assert blog.jinja_env.bytecode_cache is None
+    assert highlight.highlighter.max_entries == 7
+    assert highlight.highlighter.cache_dir is None
+
+
+def test_blog_generate_paginated_index_page(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.mkdir('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    path.join('blog.cfg').write(example_config + '\n[pagination]\nper_page = 2\n')
+    path.join('_layout').join('index.html').write(
+        '{{ page.number }}/{{ page.total_pages }} '
+        '{% for post in posts %}{{ post.title }} {% endfor %}'
+        '{{ page.previous_url }} {{ page.next_url }}')
+    posts_dir = path.join('_posts')
+    for day in range(1, 6):
+        posts_dir.join('2018-01-{:02d}-post-{}.md'.format(day, day)).write('# Post {}\n\n'.format(day))
+
+    # A page left over from an earlier build with more pages
+    site_path.mkdir('page').mkdir('9').join('index.html').write('stale')
+
+    blog = models.Blog(str(path))
+    titles = [post.title for post in reversed(blog.posts)]
+    blog.generate_index_page()
+
+    assert site_path.join('index.html').read() == '1/3 {} {} None /page/2/'.format(*titles[:2])
+    assert site_path.join('page').join('2').join('index.html').read() == \
+        '2/3 {} {} / /page/3/'.format(*titles[2:4])
+    assert site_path.join('page').join('3').join('index.html').read() == \
+        '3/3 {} /page/2/ None'.format(titles[4])
+    assert not site_path.join('page').join('9').check()
+
+
+def test_blog_build_profile(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+    path.join('_posts').join('2018-01-01-post.md').write('# Post\n\nContent.\n')
+
+    build_profiler = profiler.Profiler()
+    blog = models.Blog(str(path), build_profiler=build_profiler)
+    blog.build()
+
+    for phase in ('config', 'collect_posts', 'markdown', 'template', 'write',
+                  'index', 'feeds', 'static'):
+        assert phase in build_profiler.phases
+    assert build_profiler.slowest(1)[0][0] == str(path.join('_posts').join('2018-01-01-post.md'))
+
+
+def test_post_html_content_does_not_keep_file_contents(tmpdir):
+    f = tmpdir.mkdir('blog').join('2018-01-01-test-post.md')
+    f.write(example_post)
+
+    p = models.Post(str(tmpdir), str(f))
+    assert '<strong>content</strong>' in p.html_content
+    assert 'raw_content' not in p.__dict__
+    assert 'markdown_content' not in p.__dict__
+    assert p.markdown_content == '\n'.join(example_post.strip().splitlines()[2:])
+
+
+def test_blog_iter_posts(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+    path.join('_posts').join('2018-01-01-post.md').write('# Post\n\nContent.\n')
+    path.join('_posts').join('_2018-01-02-ignored.md').write('# Ignored\n\nContent.\n')
+    path.join('_drafts').join('2018-01-03-draft.md').write('# Draft\n\nContent.\n')
+
+    posts = blog.iter_posts()
+    assert not isinstance(posts, list)
+    assert [post.title for post in posts] == ['Post']
+    assert sorted(post.title for post in blog.iter_posts(include_drafts=True)) == ['Draft', 'Post']
+
+
+def test_blog_generate_posts_streaming(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+    path.join('_posts').join('2018-01-01-first.md').write('# First\n\nContent.\n')
+    path.join('_posts').join('2018-01-02-second.md').write('# Second\n\nContent.\n')
+
+    blog = models.Blog(str(path))
+    blog.generate_posts(stream=True)
+
+    for post in blog.posts:
+        assert os.path.isfile(post.permapath)
+        assert 'html_content' not in post.__dict__
+        assert 'raw_content' not in post.__dict__
+
+    # Released content is read again when it's needed
+    assert '<p>Content.</p>' in blog.posts[0].html_content
+
+
+def test_blog_build_streaming_releases_posts(tmpdir):
+    path = tmpdir.mkdir('blog')
+    blog = models.Blog(str(path))
+    blog.init()
+    path.join('_layout').join('tag.html').write('{% for post in posts %}{{ post.html_content }}{% endfor %}')
+    path.join('_layout').join('archive_month.html').write(
+        '{% for post in posts %}{{ post.html_content }}{% endfor %}')
+    for day in range(1, 6):
+        path.join('_posts').join('2018-01-0{}-post-{}.md'.format(day, day)).write(
+            '# Post {}\ntags: news\n\nContent.\n'.format(day))
+
+    blog = models.Blog(str(path))
+    blog.build(stream=True)
+
+    assert path.join('_site').join('tag').join('news').join('index.html').check()
+    assert path.join('_site').join('2018').join('01').join('index.html').check()
+    assert len(blog.posts) == 5
+    for post in blog.posts:
+        assert 'html_content' not in post.__dict__
+
+
+def test_post_meta(tmpdir):
+    f = tmpdir.mkdir('blog').join('2018-03-04-test-post.md')
+    f.write(example_post)
+
+    meta = models.PostMeta.from_file(str(tmpdir), str(f))
+    assert meta.title == 'Test Post'
+    assert meta.pub_date == datetime.datetime(2018, 3, 4)
+    assert meta.slug == 'test-post'
+    assert meta.permalink == os.path.join('2018', '03', 'test-post.html')
+    assert meta.permapath == os.path.join(str(tmpdir), '2018', '03', 'test-post.html')
+    assert not hasattr(meta, '__dict__')
+
+    with pytest.raises(AttributeError):
+        meta.title = 'Another title'
+
+    post = models.Post(str(tmpdir), str(f))
+    assert post.meta == meta
+    assert post.permalink is post.meta.permalink
+
+
+def test_post_collection(tmpdir):
+    posts_dir = tmpdir.mkdir('_posts')
+    filenames = ['2018-02-01-b.md', '2017-12-31-a.md', '2018-02-01-a.md',
+                 '2018-03-15-c.md', '2019-01-01-a.md']
+    for filename in filenames:
+        posts_dir.join(filename).write('# {}\n\n'.format(filename))
+    posts = models.PostCollection(models.Post(str(tmpdir), str(posts_dir.join(filename)))
+                                  for filename in filenames)
+
+    assert len(posts) == 5
+    assert [post.filename for post in posts] == sorted(filenames)
+    assert [post.filename for post in posts.latest(2)] == ['2019-01-01-a.md', '2018-03-15-c.md']
+    assert [post.filename for post in posts.latest(2, offset=4)] == ['2017-12-31-a.md']
+    assert posts.newest_first()[0].filename == '2019-01-01-a.md'
+    assert posts.newest_first()[-1].filename == '2017-12-31-a.md'
+    assert len(posts.newest_first()) == 5
+
+    assert [post.filename for post in posts.year(2018)] == \
+        ['2018-02-01-a.md', '2018-02-01-b.md', '2018-03-15-c.md']
+    assert [post.filename for post in posts.month(2018, 2)] == ['2018-02-01-a.md', '2018-02-01-b.md']
+    assert posts.month(2017, 12)[0].filename == '2017-12-31-a.md'
+    assert posts.between(datetime.datetime(2018, 3, 15), datetime.datetime(2019, 1, 1))[0].slug == 'c'
+    assert [post.filename for post in posts.by_slug('a')] == \
+        ['2017-12-31-a.md', '2018-02-01-a.md', '2019-01-01-a.md']
+    assert posts.by_slug('missing') == []
+
+
+def test_blog_generate_archives(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.join('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    layout = path.join('_layout')
+    layout.join('archive_year.html').write(
+        '{{ year }}:{% for month in months %} {{ month.month }}{% endfor %}:'
+        '{% for post in posts %} {{ post.title }}{% endfor %}')
+    layout.join('archive_month.html').write(
+        '{{ date.strftime("%Y-%m") }}:{% for post in posts %} {{ post.title }}{% endfor %}')
+
+    posts_dir = path.join('_posts')
+    posts_dir.join('2017-12-01-december.md').write('# December\n\n')
+    posts_dir.join('2018-01-01-first.md').write('# First\n\n')
+    posts_dir.join('2018-01-02-second.md').write('# Second\n\n')
+    posts_dir.join('2018-03-01-march.md').write('# March\n\n')
+
+    blog = models.Blog(str(path))
+    blog.build()
+
+    assert site_path.join('2017').join('index.html').read() == '2017: 12: December'
+    assert site_path.join('2018').join('index.html').read() == '2018: 1 3: March Second First'
+    assert site_path.join('2018').join('01').join('index.html').read() == '2018-01: Second First'
+    assert site_path.join('2018').join('03').join('index.html').read() == '2018-03: March'
+
+    # Only the pages of the months whose posts changed are rendered again
+    site_path.join('2017').join('12').join('index.html').write('stale')
+    site_path.join('2018').join('01').join('index.html').write('stale')
+    posts_dir.join('2018-03-01-march.md').remove()
+
+    blog = models.Blog(str(path))
+    blog.build()
+    assert site_path.join('2017').join('12').join('index.html').read() == 'stale'
+    assert site_path.join('2018').join('01').join('index.html').read() == 'stale'
+    assert not site_path.join('2018').join('03').join('index.html').check()
+    assert site_path.join('2018').join('index.html').read() == '2018: 1: Second First'
+
+    # Changing an archive template renders every archive page again
+    layout.join('archive_month.html').write('{{ date.strftime("%Y-%m") }}')
+    blog = models.Blog(str(path))
+    blog.build()
+    assert site_path.join('2017').join('12').join('index.html').read() == '2017-12'
+    assert site_path.join('2018').join('01').join('index.html').read() == '2018-01'
+
+
+def test_blog_rejects_negative_per_page(tmpdir):
+    tmpdir.join('blog.cfg').write(example_config + '\n[pagination]\nper_page = -2\n')
+    with pytest.raises(ValueError):
+        models.Blog(str(tmpdir))
+
+
+def test_blog_generate_paginated_archives(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.join('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    path.join('blog.cfg').write(example_config + '\n[pagination]\nper_page = 2\n')
+    layout = path.join('_layout')
+    layout.join('archive_year.html').write(
+        '{{ year }} {{ page.number }}/{{ page.total_pages }}:{% for post in posts %} {{ post.title }}{% endfor %}'
+        ' {{ page.previous_url }} {{ page.next_url }}')
+    layout.join('archive_month.html').write(
+        '{{ month }} {{ page.number }}:{% for post in posts %} {{ post.title }}{% endfor %}')
+
+    posts_dir = path.join('_posts')
+    for day in range(1, 6):
+        posts_dir.join('2018-01-{:02d}-post-{}.md'.format(day, day)).write('# Post {}\n\n'.format(day))
+
+    blog = models.Blog(str(path))
+    blog.build()
+
+    year_dir = site_path.join('2018')
+    assert year_dir.join('index.html').read() == '2018 1/3: Post 5 Post 4 None /2018/page/2/'
+    assert year_dir.join('page').join('2').join('index.html').read() == \
+        '2018 2/3: Post 3 Post 2 /2018/ /2018/page/3/'
+    assert year_dir.join('page').join('3').join('index.html').read() == '2018 3/3: Post 1 /2018/page/2/ None'
+    assert year_dir.join('01').join('page').join('3').join('index.html').read() == '1 3: Post 1'
+
+    # Pages left over from a build with more posts are removed
+    posts_dir.join('2018-01-01-post-1.md').remove()
+    blog = models.Blog(str(path))
+    blog.build()
+    assert not year_dir.join('page').join('3').check()
+    assert not year_dir.join('01').join('page').join('3').check()
+    assert year_dir.join('01').join('page').join('2').join('index.html').read() == '1 2: Post 3 Post 2'
+
+
+def test_post_with_metadata(tmpdir):
+    f = tmpdir.mkdir('blog').join('2018-01-01-test-post.md')
+    f.write("""\
+# Test Post
+tags: python, web , 
+Categories: programming
+summary: A short summary.
+
+The content.
+Tags: not metadata
+""")
+
+    p = models.Post(str(tmpdir), str(f))
+    assert p.title == 'Test Post'
+    assert p.tags == ('python', 'web')
+    assert p.categories == ('programming',)
+    assert p.summary == 'A short summary.'
+    assert p.markdown_content == 'The content.\nTags: not metadata'
+
+    f.write(example_post)
+    p = models.Post(str(tmpdir), str(f))
+    assert p.tags == ()
+    assert p.summary == ''
+    assert p.markdown_content == '\n'.join(example_post.strip().splitlines()[2:])
+
+
+def test_blog_generate_taxonomies(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.mkdir('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    layout = path.join('_layout')
+    layout.join('tag.html').write('{{ tag }}:{% for post in posts %} {{ post.title }}{% endfor %}')
+    layout.join('rss.xml').write('{{ feed_path }}:{% for post in posts %} {{ post.title }}{% endfor %}')
+    posts_dir = path.join('_posts')
+    posts_dir.join('2018-01-01-first.md').write('# First\ntags: Python, web\n\n')
+    posts_dir.join('2018-01-02-second.md').write('# Second\ntags: Python\ncategories: code\n\n')
+
+    blog = models.Blog(str(path))
+    assert sorted(blog.posts.tags()) == ['Python', 'web']
+    blog.generate_taxonomies()
+
+    python_dir = site_path.join('tag').join('python')
+    assert python_dir.join('index.html').read() == 'Python: Second First'
+    assert python_dir.join('rss.xml').read() == 'tag/python/rss.xml: Second First'
+    assert python_dir.join('feed.json').check()
+    assert site_path.join('tag').join('web').join('index.html').read() == 'web: First'
+    assert site_path.join('category').join('code').join('rss.xml').read() == \
+        'category/code/rss.xml: Second'
+    # There's no category.html template
+    assert not site_path.join('category').join('code').join('index.html').check()
+
+    # Tags that are no longer used are removed
+    posts_dir.join('2018-01-01-first.md').write('# First\n\n')
+    blog = models.Blog(str(path))
+    blog.generate_taxonomies()
+    assert not site_path.join('tag').join('web').check()
+    assert python_dir.join('index.html').read() == 'Python: Second'
+
+
+def test_blog_generate_taxonomies_merges_slugs(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.mkdir('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    path.join('_layout').join('tag.html').write('{{ tag }}:{% for post in posts %} {{ post.title }}{% endfor %}')
+    posts_dir = path.join('_posts')
+    posts_dir.join('2018-01-01-first.md').write('# First\ntags: Python\n\n')
+    posts_dir.join('2018-01-02-second.md').write('# Second\ntags: python, PYTHON\n\n')
+
+    blog = models.Blog(str(path))
+    assert list(blog.posts.tags()) == ['Python']
+    blog.generate_taxonomies()
+
+    python_dir = site_path.join('tag').join('python')
+    assert python_dir.join('index.html').read() == 'Python: Second First'
+    assert python_dir.join('rss.xml').read().count('Second') == 1
+    assert 'First' in python_dir.join('rss.xml').read()
+
+
+def test_blog_generate_paginated_taxonomies(tmpdir):
+    path = tmpdir.mkdir('blog')
+    site_path = path.mkdir('_site')
+    blog = models.Blog(str(path))
+    blog.init()
+
+    path.join('blog.cfg').write(example_config + '\n[pagination]\nper_page = 2\n')
+    path.join('_layout').join('tag.html').write(
+        '{{ page.number }}:{% for post in posts %} {{ post.title }}{% endfor %} {{ page.next_url }}')
+    posts_dir = path.join('_posts')
+    for day in range(1, 4):
+        posts_dir.join('2018-01-{:02d}-post-{}.md'.format(day, day)).write(
+            '# Post {}\ntags: news\n\n'.format(day))
+
+    blog = models.Blog(str(path))
+    blog.generate_taxonomies()
+
+    news_dir = site_path.join('tag').join('news')
+    assert news_dir.join('index.html').read() == '1: Post 3 Post 2 /tag/news/page/2/'
+    assert news_dir.join('page').join('2').join('index.html').read() == '2: Post 1 None'
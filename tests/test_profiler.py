@@ -0,0 +1,43 @@
+from nanogen import profiler
+
+
+def test_profiler_phases():
+    p = profiler.Profiler()
+    with p.phase('render', 'a.md'):
+        pass
+    with p.phase('render', 'b.md'):
+        pass
+    p.add('write', 0.5, 'a.md')
+
+    data = p.to_dict()
+    assert data['phases']['render']['calls'] == 2
+    assert data['phases']['write'] == {'seconds': 0.5, 'calls': 1}
+    assert p.slowest(1)[0][0] == 'a.md'
+    assert 'render' in p.report()
+    assert 'a.md' in p.report()
+
+
+def test_disabled_profiler_records_nothing():
+    p = profiler.Profiler(enabled=False)
+    with p.phase('render', 'a.md'):
+        pass
+    assert p.to_dict() == {'phases': {}, 'items': {}}
+
+
+def test_profiler_merge():
+    worker = profiler.Profiler()
+    worker.add('markdown', 0.25, 'a.md')
+
+    p = profiler.Profiler()
+    p.add('markdown', 0.25, 'b.md')
+    p.merge(worker.to_dict())
+    assert p.phases['markdown'] == (0.5, 2)
+    assert p.items == {'a.md': 0.25, 'b.md': 0.25}
+
+
+def test_profiler_dump_json(tmpdir):
+    p = profiler.Profiler()
+    p.add('feeds', 1.0)
+    output = tmpdir.join('timings.json')
+    p.dump_json(str(output))
+    assert '"feeds"' in output.read()
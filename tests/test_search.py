@@ -0,0 +1,62 @@
+import gzip
+import json
+
+from unittest import mock
+
+from nanogen import models
+from nanogen import search
+
+
+def test_tokenize():
+    assert search.tokenize('The cat, the HAT & a bat!') == {'the': 2, 'cat': 1, 'hat': 1, 'bat': 1}
+
+
+def make_posts(tmpdir):
+    posts_dir = tmpdir.mkdir('_posts')
+    posts_dir.join('2018-01-01-python.md').write('# Python tips\n\nUse python for scripting.\n')
+    posts_dir.join('2018-01-02-shell.md').write('# Shell\n\nScripting with bash.\n')
+    return [models.Post(str(tmpdir), str(posts_dir.join(name)))
+            for name in ('2018-01-02-shell.md', '2018-01-01-python.md')]
+
+
+def load_shard(output_dir, meta, term, compressed=False):
+    path = output_dir.join('search').join(meta['shards'][term[:meta['prefix_length']]])
+    data = gzip.decompress(path.read_binary()) if compressed else path.read_binary()
+    return json.loads(data.decode('utf-8'))[term]
+
+
+def test_search_index(tmpdir):
+    output_dir = tmpdir.join('_site')
+    posts = make_posts(tmpdir)
+
+    index = search.SearchIndex(str(output_dir), str(tmpdir.join('cache.json')))
+    index.build(posts)
+
+    meta = json.loads(output_dir.join('search').join('meta.json').read())
+    docs = json.loads(output_dir.join('search').join('docs.json').read())
+    assert docs[0] == {'title': 'Shell', 'url': '/2018/01/shell.html', 'date': '2018-01-02'}
+    assert load_shard(output_dir, meta, 'scripting') == [[0, 1], [1, 1]]
+    assert load_shard(output_dir, meta, 'python') == [[1, search.TITLE_WEIGHT + 1]]
+
+
+def test_search_index_is_incremental(tmpdir):
+    posts = make_posts(tmpdir)
+    cache_file = str(tmpdir.join('cache.json'))
+    search.SearchIndex(str(tmpdir.join('_site')), cache_file).build(posts)
+
+    tmpdir.join('_posts').join('2018-01-02-shell.md').write('# Shell\n\nZsh.\n')
+    with mock.patch('nanogen.search.tokenize', wraps=search.tokenize) as tokenize:
+        search.SearchIndex(str(tmpdir.join('_site')), cache_file).build(posts)
+    tokenized = [call[0][0] for call in tokenize.call_args_list]
+    assert tokenized == ['Zsh.', 'Shell']
+
+
+def test_search_index_compressed(tmpdir):
+    output_dir = tmpdir.join('_site')
+    index = search.SearchIndex(str(output_dir), str(tmpdir.join('cache.json')),
+                               prefix_length=1, compress=True)
+    index.build(make_posts(tmpdir))
+
+    meta = json.loads(output_dir.join('search').join('meta.json').read())
+    assert meta['shards']['p'] == 'shards/p.json.gz'
+    assert load_shard(output_dir, meta, 'bash', compressed=True) == [[0, 1]]
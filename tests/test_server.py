@@ -0,0 +1,142 @@
+import gzip
+import http.client
+import os
+import threading
+
+import pytest
+
+from nanogen import compress
+from nanogen import server
+
+
+@pytest.fixture
+def site(tmpdir):
+    site = tmpdir.mkdir('site')
+    site.join('index.html').write('<h1>Index</h1>')
+    site.mkdir('static').join('site.css').write('body { color: red; }' * 100)
+    site.join('about').mkdir()
+
+    httpd = server.PreviewServer(str(site), 'localhost', 0)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield site, httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def connect(httpd):
+    return http.client.HTTPConnection('localhost', httpd.server_address[1], timeout=5)
+
+
+def get(conn, path, **headers):
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_file_cache(tmpdir):
+    cache = server.FileCache(max_size=10, max_file_size=6)
+    paths = []
+    for name in ('a', 'b', 'big'):
+        path = tmpdir.join(name)
+        path.write(name * 4 if name != 'big' else 'x' * 7)
+        paths.append(str(path))
+
+    assert cache.read(paths[0], os.stat(paths[0])) == b'aaaa'
+    assert cache.read(paths[1], os.stat(paths[1])) == b'bbbb'
+    assert len(cache) == 2 and cache.size == 8
+    assert cache.read(paths[2], os.stat(paths[2])) == b'x' * 7
+    assert len(cache) == 2
+
+    # A changed file is read again
+    tmpdir.join('b').write('bbbbbb')
+    assert cache.read(paths[1], os.stat(paths[1])) == b'bbbbbb'
+    assert list(cache.entries) == [paths[0], paths[1]]
+    assert cache.size == 10
+
+    # The least recently used entry is evicted to make room
+    tmpdir.join('a').write('aaaaa')
+    assert cache.read(paths[0], os.stat(paths[0])) == b'aaaaa'
+    assert list(cache.entries) == [paths[0]]
+    assert cache.size == 5
+
+
+def test_keep_alive_and_conditional_requests(site):
+    site, httpd = site
+    conn = connect(httpd)
+
+    response, body = get(conn, '/')
+    assert response.status == 200
+    assert body == b'<h1>Index</h1>'
+    assert response.getheader('Content-Type') == 'text/html'
+    etag = response.getheader('ETag')
+    last_modified = response.getheader('Last-Modified')
+
+    # The same connection is reused for the following requests
+    response, body = get(conn, '/index.html', **{'If-None-Match': etag})
+    assert response.status == 304
+    assert body == b''
+    response, _ = get(conn, '/index.html', **{'If-Modified-Since': last_modified})
+    assert response.status == 304
+
+    site.join('index.html').write('<h1>Changed</h1>')
+    os.utime(str(site.join('index.html')), (1, 1))
+    response, body = get(conn, '/index.html', **{'If-None-Match': etag})
+    assert response.status == 200
+    assert body == b'<h1>Changed</h1>'
+
+    response, _ = get(conn, '/missing.html')
+    assert response.status == 404
+    response, _ = get(conn, '/about')
+    assert response.status == 301
+    conn.close()
+
+
+def test_serves_compressed_siblings(site):
+    site, httpd = site
+    css = site.join('static').join('site.css')
+    compress.compress_file(str(css))
+    conn = connect(httpd)
+
+    response, body = get(conn, '/static/site.css', **{'Accept-Encoding': 'gzip, deflate'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert response.getheader('Content-Type') == 'text/css'
+    assert gzip.decompress(body) == css.read_binary()
+
+    response, body = get(conn, '/static/site.css')
+    assert response.getheader('Content-Encoding') is None
+    assert body == css.read_binary()
+
+    # A sibling that's older than its file isn't served
+    css.write('a {}')
+    response, body = get(conn, '/static/site.css', **{'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') is None
+    assert body == b'a {}'
+    conn.close()
+
+
+def test_idle_connection_does_not_block_others(site):
+    _, httpd = site
+    idle = connect(httpd)
+    idle.connect()
+
+    conn = connect(httpd)
+    response, _ = get(conn, '/')
+    assert response.status == 200
+    conn.close()
+    idle.close()
+
+
+def test_serves_only_its_directory(site, tmpdir):
+    _, httpd = site
+    tmpdir.join('secret.txt').write('secret')
+    conn = connect(httpd)
+
+    response, body = get(conn, '/../secret.txt')
+    assert response.status == 404
+
+    response, body = get(conn, '/about/../index.html')
+    assert response.status == 200
+    assert body == b'<h1>Index</h1>'
+    conn.close()
@@ -1,3 +1,7 @@
+import os
+
+import pytest
+
 from nanogen import utils
 
 
@@ -14,3 +18,106 @@ def test_is_valid_post_file():
     assert not utils.is_valid_post_file('2018-01-01-example-file.html')
     assert utils.is_valid_post_file('2018-01-01-example-file.md')
 
+
+def test_sync_tree(tmpdir):
+    source = tmpdir.mkdir('source')
+    source.join('keep.css').write('body {}')
+    source.join('change.css').write('a {}')
+    source.mkdir('img').join('logo.svg').write('<svg/>')
+    dest = tmpdir.join('dest')
+
+    assert utils.sync_tree(str(source), str(dest)) == (3, 0)
+    assert dest.join('img').join('logo.svg').read() == '<svg/>'
+    assert utils.sync_tree(str(source), str(dest)) == (0, 0)
+
+    source.join('change.css').write('a { color: red; }')
+    source.join('img').join('logo.svg').remove()
+    dest.join('orphan.js').write('')
+    assert utils.sync_tree(str(source), str(dest)) == (1, 2)
+    assert dest.join('change.css').read() == 'a { color: red; }'
+    assert not dest.join('orphan.js').check()
+    assert not dest.join('img').join('logo.svg').check()
+    assert dest.join('img').check(dir=True)
+
+
+def test_sync_tree_checksum(tmpdir):
+    source = tmpdir.mkdir('source')
+    source.join('file.txt').write('same')
+    dest = tmpdir.join('dest')
+    utils.sync_tree(str(source), str(dest), link='copy')
+
+    # Touching a file only copies it when contents aren't compared
+    os.utime(str(source.join('file.txt')), (0, 0))
+    assert utils.sync_tree(str(source), str(dest), checksum=True) == (0, 0)
+    assert utils.sync_tree(str(source), str(dest)) == (1, 0)
+
+
+def test_write_file_permissions(tmpdir):
+    umask = os.umask(0o022)
+    try:
+        target = tmpdir.join('page.html')
+        assert utils.write_file(str(target), u'<p></p>')
+        with utils.open_atomic(str(tmpdir.join('feed.xml'))) as f:
+            f.write(b'<feed/>')
+    finally:
+        os.umask(umask)
+
+    # Written like a plain open() would, not with mkstemp's 0600
+    assert os.stat(str(target)).st_mode & 0o777 == 0o644
+    assert os.stat(str(tmpdir.join('feed.xml'))).st_mode & 0o777 == 0o644
+    assert sorted(tmpdir.listdir()) == [tmpdir.join('feed.xml'), target]
+
+
+def test_open_atomic(tmpdir):
+    target = tmpdir.join('feed.xml')
+    with utils.open_atomic(str(target)) as f:
+        f.write(b'<feed/>')
+    assert target.read() == '<feed/>'
+
+    # Unchanged content leaves the file alone
+    os.utime(str(target), (1, 1))
+    with utils.open_atomic(str(target)) as f:
+        f.write(b'<feed/>')
+    assert os.stat(str(target)).st_mtime == 1
+
+    # A failed write leaves the old file and no temporary file behind
+    with pytest.raises(RuntimeError):
+        with utils.open_atomic(str(target)) as f:
+            f.write(b'<feed>')
+            raise RuntimeError()
+    assert target.read() == '<feed/>'
+    assert tmpdir.listdir() == [target]
+
+
+def test_copy_file_hardlink(tmpdir):
+    source = tmpdir.join('source.txt')
+    source.write('content')
+    dest = tmpdir.join('sub').join('dest.txt')
+
+    utils.copy_file(str(source), str(dest), link='hardlink')
+    assert dest.read() == 'content'
+    assert os.path.samefile(str(source), str(dest))
+
+
+def test_write_file(tmpdir):
+    target = tmpdir.join('page.html')
+
+    assert utils.write_file(str(target), u'<p>café</p>')
+    assert target.read_binary() == u'<p>café</p>'.encode('utf-8')
+    mtime = os.stat(str(target)).st_mtime_ns
+
+    # Identical content leaves the file alone
+    assert not utils.write_file(str(target), u'<p>café</p>')
+    assert os.stat(str(target)).st_mtime_ns == mtime
+
+    assert utils.write_file(str(target), b'<p>new</p>')
+    assert target.read() == '<p>new</p>'
+    assert tmpdir.listdir() == [target]
+
+
+def test_iter_post_files(tmpdir):
+    tmpdir.join('2018-01-01-example-file.md').write('')
+    tmpdir.join('notes.txt').write('')
+
+    assert list(utils.iter_post_files(str(tmpdir))) == [str(tmpdir.join('2018-01-01-example-file.md'))]
+    assert list(utils.iter_post_files(str(tmpdir.join('missing')))) == []
@@ -0,0 +1,32 @@
+from nanogen import watcher
+
+
+def test_watcher_changes(tmpdir):
+    watched = tmpdir.mkdir('watched')
+    existing = watched.join('existing.txt')
+    existing.write('before')
+    removed = watched.join('removed.txt')
+    removed.write('soon gone')
+
+    w = watcher.Watcher([str(watched)])
+    assert w.changes() == set()
+
+    existing.write('after, and longer')
+    removed.remove()
+    added = watched.mkdir('sub').join('added.txt')
+    added.write('new')
+
+    assert w.changes() == set([str(existing), str(removed), str(added)])
+    assert w.changes() == set()
+
+
+def test_watcher_watch_calls_back(tmpdir):
+    watched = tmpdir.join('file.txt')
+    watched.write('before')
+
+    w = watcher.Watcher([str(watched)], interval=0)
+    watched.write('after, and longer')
+
+    calls = []
+    w.watch(calls.append, should_stop=lambda: len(calls) > 0)
+    assert calls == [set([str(watched)])]
@@ -0,0 +1,56 @@
+import os
+
+from unittest import mock
+
+import pytest
+
+from nanogen import writer
+
+
+def test_directory_cache(tmpdir):
+    directories = writer.DirectoryCache()
+    target = str(tmpdir.join('2018').join('01'))
+
+    directories.ensure(target)
+    assert os.path.isdir(target)
+    with mock.patch('os.makedirs') as makedirs:
+        directories.ensure(target)
+        assert not makedirs.called
+
+
+def test_output_writer(tmpdir):
+    with writer.OutputWriter(threads=2, max_pending=2) as output:
+        for number in range(20):
+            path = tmpdir.join(str(number % 4)).join('{}.html'.format(number))
+            output.write(str(path), u'<p>{}</p>'.format(number))
+
+    assert output.written == 20
+    assert tmpdir.join('3').join('19.html').read() == '<p>19</p>'
+    assert len(output.directories.seen) == 4
+
+    with writer.OutputWriter() as output:
+        output.write(str(tmpdir.join('0').join('0.html')), u'<p>0</p>')
+    assert (output.written, output.unchanged) == (0, 1)
+
+
+def test_output_writer_raises_errors(tmpdir):
+    tmpdir.join('file').write('')
+    with pytest.raises(OSError):
+        with writer.OutputWriter(threads=1) as output:
+            # A file is in the way of the directory
+            output.write(str(tmpdir.join('file').join('page.html')), u'<p></p>')
+            output.write(str(tmpdir.join('page.html')), u'<p></p>')
+    assert not tmpdir.join('page.html').check()
+
+
+def test_output_writer_does_not_mask_errors(tmpdir):
+    tmpdir.join('file').write('')
+    with pytest.raises(KeyError):
+        with writer.OutputWriter(threads=1) as output:
+            output.write(str(tmpdir.join('file').join('page.html')), u'<p></p>')
+            raise KeyError('rendering failed')
+
+
+def test_output_writer_must_be_bounded():
+    with pytest.raises(ValueError):
+        writer.OutputWriter(max_pending=0)